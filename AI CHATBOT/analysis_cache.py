@@ -0,0 +1,185 @@
+import contextlib
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import inference_backends
+import weapon_screen
+
+# --- Image Analysis Result Cache ---
+# Results are keyed by a hash of the decoded pixels plus the model and options
+# that produced them, so re-uploading the same picture (even re-encoded or
+# renamed) is answered from memory, or from disk if a cache dir is configured.
+
+MEMORY_ITEMS = int(os.environ.get("OMNIBOT_CACHE_MAX_ITEMS", "256"))
+DISK_DIR = os.environ.get("OMNIBOT_CACHE_DIR", "")
+DISK_MAX_MB = float(os.environ.get("OMNIBOT_CACHE_DISK_MB", "512"))
+# Writes are added to a running size; the directory is only listed when that
+# passes the limit, or after this long (other processes may share the dir)
+DISK_RESCAN_SECONDS = 60.0
+
+# Model behind each analysis, used to include its inference backend in the key
+ANALYSIS_MODELS = {"screen": "mobilenet_v3", "caption": "blip", "detect": "fasterrcnn", "segment": "deeplabv3"}
+
+# Bump a version when a model or its postprocessing changes
+MODEL_VERSIONS = {
+    "screen": "mobilenet_v3_small@1",
+    "caption": "Salesforce/blip-image-captioning-base@1",
+    "detect": "fasterrcnn_resnet50_fpn@3",
+    "segment": "deeplabv3_resnet101@1",
+}
+
+
+def image_hash(image):
+    digest = hashlib.sha256()
+    digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def make_key(pixel_hash, analysis, options=None):
+    options_part = json.dumps(options or {}, sort_keys=True, default=str)
+    model_part = MODEL_VERSIONS.get(analysis, analysis)
+    if analysis in ANALYSIS_MODELS:
+        model_part += ":" + inference_backends.backend_for(ANALYSIS_MODELS[analysis])
+    if analysis == "screen":
+        model_part += ":" + weapon_screen.config_key()
+    return hashlib.sha256(f"{pixel_hash}|{analysis}|{model_part}|{options_part}".encode()).hexdigest()
+
+
+class AnalysisCache:
+    def __init__(self, max_items=MEMORY_ITEMS, disk_dir=DISK_DIR, disk_max_mb=DISK_MAX_MB):
+        self.max_items = max_items
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = int(disk_max_mb * 1024 * 1024)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "disk_evictions": 0}
+        self._disk_bytes = None  # Estimated size of the cache dir, None until first listed
+        self._disk_scanned = 0.0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return True, self._memory[key]
+
+        found, value = self._disk_get(key)
+        with self._lock:
+            if found:
+                self._stats["disk_hits"] += 1
+                self._remember(key, value)
+            else:
+                self._stats["misses"] += 1
+        return found, value
+
+    def put(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+        self._disk_put(key, value)
+
+    def _remember(self, key, value):
+        if self.max_items <= 0:
+            return
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    # --- Disk Tier ---
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key + ".pkl")
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return False, None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(path)  # Mark as recently used for eviction
+            return True, value
+        except (OSError, pickle.PickleError, EOFError):
+            return False, None
+
+    def _disk_put(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        tmp_path = None
+        try:
+            # mkstemp: unique across processes sharing the dir, not only across threads
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                size = f.tell()
+            try:
+                replaced = os.path.getsize(path)  # An overwritten entry frees its old size
+            except OSError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except (OSError, pickle.PickleError):
+            if tmp_path is not None:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_path)
+            return
+        with self._lock:
+            stale = self._disk_bytes is None or time.monotonic() - self._disk_scanned > DISK_RESCAN_SECONDS
+            if not stale:
+                self._disk_bytes += size - replaced
+            over = stale or self._disk_bytes > self.disk_max_bytes
+        if over:
+            self._disk_evict()
+
+    def _disk_evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(".pkl"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.disk_dir, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+            total += st.st_size
+
+        # Least recently used files go first
+        for _, size, name in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.disk_dir, name))
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self._stats["disk_evictions"] += 1
+        with self._lock:
+            self._disk_bytes = total
+            self._disk_scanned = time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_items"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+        stats["disk_enabled"] = bool(self.disk_dir)
+        return stats
+
+
+# Shared cache used by the vision pipeline
+cache = AnalysisCache()
@@ -0,0 +1,276 @@
+import asyncio
+import contextvars
+import functools
+import importlib
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from quart import Quart, Response, jsonify, render_template, request
+
+import detection
+import doc_extract
+import doc_index
+import job_queue
+import mask_codec
+import reply_stream
+import request_metrics
+import session_store
+import vision_pipeline
+import wiki_store
+
+# --- ASGI Entry Point ---
+# The /chat and /upload routes (same JSON as the Flask app) on Quart, so one
+# process can hold many slow or idle connections:
+#
+#   pip install quart aiohttp uvicorn
+#   cd "AI CHATBOT" && uvicorn asgi:app
+#
+# Wikipedia articles are fetched as coroutines over one pooled aiohttp session
+# (at most OMNIBOT_WIKI_CONNECTIONS connections). CPU-bound work (intent
+# handlers, document extraction, the vision models) runs on a pool of
+# OMNIBOT_ASYNC_THREADS threads, so the event loop itself never blocks.
+# Job and image-upload event streams await asyncio events between messages,
+# so a client idling on one holds no thread.
+# Intents, chat replies and upload defaults come from the Flask module named
+# by OMNIBOT_APP (hi or main); its read-only GET routes (/models, /*-metrics)
+# are served as they are.
+
+APP_MODULE = os.environ.get("OMNIBOT_APP", "hi")
+THREADS = int(os.environ.get("OMNIBOT_ASYNC_THREADS", "8"))
+WIKI_CONNECTIONS = int(os.environ.get("OMNIBOT_WIKI_CONNECTIONS", "20"))
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+flask_module = importlib.import_module(APP_MODULE)
+flask_app = flask_module.app
+
+app = Quart(__name__)
+app.config["MAX_CONTENT_LENGTH"] = flask_app.config.get("MAX_CONTENT_LENGTH")  # Quart caps uploads at 16 MB otherwise
+session_store.init_async_app(app)
+request_metrics.init_async_app(app)
+
+_executor = ThreadPoolExecutor(max_workers=THREADS, thread_name_prefix="asgi")
+_http = None  # aiohttp.ClientSession, opened with the server
+
+
+# --- Running Blocking Code ---
+async def run_blocking(fn, *args, **kwargs):
+    # The context is copied so session_store.current_session_id() works in the thread
+    call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(_executor, call)
+
+
+async def iterate_blocking(iterator):
+    # A blocking generator (NDJSON pages, a chat reply) consumed one item per thread hop;
+    # only for generators that compute their items, since each next() holds a pool thread
+    done = object()
+    while True:
+        item = await run_blocking(next, iterator, done)
+        if item is done:
+            return
+        yield item
+
+
+def _event_stream(events):
+    # events: an async iterator of SSE lines
+    return Response(events, mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def from_flask(fn, *args):
+    # Calls a helper that builds a Flask response and converts it to a Quart one
+    with flask_app.app_context():
+        response = flask_app.make_response(fn(*args))
+        return Response(response.get_data(), status=response.status_code, headers=dict(response.headers))
+
+
+@app.before_serving
+async def _open_http():
+    global _http
+    import aiohttp
+    _http = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=WIKI_CONNECTIONS),
+                                  timeout=aiohttp.ClientTimeout(total=wiki_store.TIMEOUT))
+
+
+@app.after_serving
+async def _close_http():
+    await _http.close()
+    _executor.shutdown(wait=False)
+
+
+# --- Chat ---
+async def _prefetch_wikipedia(message):
+    # Wikipedia questions are fetched here without holding a thread; the
+    # assistant logic then finds the article in wiki_store's cache
+    matched = [intent for intent, match in flask_module.router.route(message) if match is not None]
+    if not matched or matched[0]["name"] != "wikipedia":
+        return
+    try:
+        await wiki_store.store.prefetch(flask_module.wikipedia_query(message),
+                                        functools.partial(wiki_store.fetch_online_async, _http))
+    except LookupError:
+        pass  # get_wikipedia_info answers with its usual apology
+
+
+async def _chat_stream(message):
+    # The start event goes out before the Wikipedia fetch, not after it
+    lines = reply_stream.chat_events(flask_module.assistant_logic, message)
+    yield next(lines)
+    await _prefetch_wikipedia(message.lower())
+    async for line in iterate_blocking(lines):
+        yield line
+
+
+@app.route("/chat", methods=["POST"])
+async def chat():
+    user_message = (await request.get_json()).get("message", "")
+    if reply_stream.wants_stream(SimpleNamespace(values=await request.values, headers=request.headers)):
+        return _event_stream(_chat_stream(user_message))
+    await _prefetch_wikipedia(user_message.lower())
+    reply = await run_blocking(flask_module.assistant_logic, user_message)
+    return jsonify({"reply": reply})
+
+
+# --- Uploads ---
+def _analyze_upload(data, analyses, mask_format, detect_options):
+    image = vision_pipeline.decode_image(data)
+    result = vision_pipeline.analyze(image, analyses, detect_options=detect_options)
+    return vision_pipeline.build_response(result, mask_format=mask_format)
+
+
+def _extract_document(file, filename):
+    pieces = list(doc_extract.iter_document(file, filename.lower()))
+    doc_index.add_document(filename, pieces)
+    return {"type": "text", "result": "".join(text for _, _, text in pieces)}
+
+
+def _copy_upload(file):
+    # Quart closes the upload when the handler returns, before a streamed
+    # response is finished, so the pages are read from a copy
+    copy = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    shutil.copyfileobj(file.stream, copy)
+    copy.seek(0)
+    return copy
+
+
+async def _stream_document(copy, filename):
+    try:
+        async for line in iterate_blocking(doc_extract.ndjson_lines(copy, filename, ingest=doc_index.open_document)):
+            yield line
+    finally:
+        copy.close()
+
+
+@app.route('/upload', methods=['POST'])
+async def upload():
+    files = await request.files
+    file = files.get('file') or files.get('image')
+    if not file:
+        return jsonify({"status": "no file uploaded"})
+    values = await request.values
+    form = SimpleNamespace(values=values, headers=request.headers)  # what the wants_*() helpers read
+    filename = file.filename.lower()
+    try:
+        if filename.endswith(IMAGE_EXTENSIONS):
+            analyses = vision_pipeline.parse_analyses(values.get("analyses"), default=flask_module.UPLOAD_ANALYSES)
+            mask_format = mask_codec.parse_format(values.get("mask_format"))
+            detect_options = detection.parse_options(values)
+            if job_queue.wants_async(form):
+                try:
+                    job = job_queue.jobs.submit(vision_pipeline.run_job, file.read(), analyses,
+                                                 mask_format=mask_format, detect_options=detect_options)
+                except job_queue.QueueFull:
+                    return from_flask(job_queue.busy)
+                return from_flask(job_queue.accepted, job)
+            if reply_stream.wants_stream(form):
+                return _event_stream(_upload_events(file.read(), analyses, mask_format, detect_options))
+            return jsonify(await run_blocking(_analyze_upload, file.read(), analyses, mask_format, detect_options))
+
+        elif filename.endswith(doc_extract.EXTENSIONS) and doc_extract.wants_stream(form):
+            copy = await run_blocking(_copy_upload, file)
+            return Response(_stream_document(copy, file.filename), mimetype="application/x-ndjson")
+        elif filename.endswith(doc_extract.EXTENSIONS):
+            return jsonify(await run_blocking(_extract_document, file, file.filename))
+        else:
+            return jsonify({"status": "error", "message": "Unsupported file type"})
+
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)})
+
+
+async def _upload_events(data, analyses, mask_format, detect_options):
+    # reply_stream.upload_events() with an asyncio.Queue, so waiting for the
+    # next token doesn't hold one of the pool's threads
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    reply_stream.start_upload(lambda item: loop.call_soon_threadsafe(events.put_nowait, item),
+                              data, analyses, mask_format=mask_format, detect_options=detect_options)
+    yield reply_stream.event("start", {})
+    while True:
+        item = await events.get()
+        if item is None:
+            return
+        yield reply_stream.event(*item)
+
+
+def _mask_response(data, mask_format):
+    result = vision_pipeline.analyze(vision_pipeline.decode_image(data), ("segment",))
+    if vision_pipeline.screened_out(result):
+        body = dict(vision_pipeline.build_response(result), status="error",
+                    message="Image flagged by weapon screening; no mask was computed.")
+        return Response(json.dumps(body), status=422, mimetype="application/json")
+    return from_flask(mask_codec.binary_response, result["segmentation"], mask_format)
+
+
+@app.route('/upload/mask', methods=['POST'])
+async def upload_mask():
+    files = await request.files
+    file = files.get('file') or files.get('image')
+    if not file:
+        return jsonify({"status": "no file uploaded"})
+    try:
+        values = await request.values
+        mask_format = mask_codec.parse_format(values.get("format"), default="raw", formats=mask_codec.BINARY_FORMATS)
+        return await run_blocking(_mask_response, file.read(), mask_format)
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)})
+
+
+# --- Jobs ---
+@app.route("/jobs/<job_id>")
+async def job_status(job_id):
+    return from_flask(job_queue.status_response, job_id)
+
+
+@app.route("/jobs/<job_id>/events")
+async def job_events(job_id):
+    job = job_queue.jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown or expired job"}), 404
+    return _event_stream(job_queue.event_lines_async(job))
+
+
+# --- Routes ---
+@app.route("/")
+async def index():
+    return await render_template("index.html")
+
+
+def _add_flask_get_routes():
+    taken = {rule.rule for rule in app.url_map.iter_rules()}
+    for rule in flask_app.url_map.iter_rules():
+        if rule.rule in taken or rule.arguments or "GET" not in rule.methods or rule.endpoint == "static":
+            continue
+        view = flask_app.view_functions[rule.endpoint]
+
+        # /metrics renders every histogram and the stats views take component
+        # locks, so they run on the thread pool rather than on the event loop
+        async def proxy(view=view):
+            return await run_blocking(from_flask, view)
+        app.add_url_rule(rule.rule, rule.endpoint, proxy)
+
+
+_add_flask_get_routes()
@@ -0,0 +1,167 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import inference_governor
+import model_registry
+
+# --- Caption Micro-Batching ---
+# Uploads that arrive within a short window are captioned together in one
+# batched BLIP generate() call instead of one forward pass per request.
+
+MAX_BATCH_SIZE = int(os.environ.get("OMNIBOT_CAPTION_MAX_BATCH", "8"))
+MAX_WAIT_MS = float(os.environ.get("OMNIBOT_CAPTION_MAX_WAIT_MS", "20"))
+
+
+class CaptionBatcher:
+    def __init__(self, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, caption_fn=None):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._caption_fn = caption_fn or _blip_caption_batch
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        self._metrics = {
+            "batches": 0,
+            "images": 0,
+            "errors": 0,
+            "queue_wait_total": 0.0,
+            "queue_wait_max": 0.0,
+            "compute_total": 0.0,
+        }
+
+    def submit(self, image) -> Future:
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((image, future, time.perf_counter()))
+        return future
+
+    def caption(self, image, timeout=None) -> str:
+        return self.submit(image).result(timeout)
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="caption-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        # Block for the first request, then wait up to max_wait for more to join
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            self._process(self._collect())
+
+    def _process(self, batch):
+        started = time.perf_counter()
+        waits = [started - enqueued for _, _, enqueued in batch]
+        try:
+            captions = self._caption_fn([image for image, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            captions = None
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            m = self._metrics
+            m["batches"] += 1
+            m["images"] += len(batch)
+            m["queue_wait_total"] += sum(waits)
+            m["queue_wait_max"] = max(m["queue_wait_max"], max(waits))
+            m["compute_total"] += elapsed
+            if captions is None:
+                m["errors"] += 1
+
+        if captions is not None:
+            for (_, future, _), caption in zip(batch, captions):
+                future.set_result(caption)
+
+    def metrics(self):
+        with self._lock:
+            m = dict(self._metrics)
+        batches = m["batches"] or 1
+        images = m["images"] or 1
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queued": self._queue.qsize(),
+            "batches": m["batches"],
+            "images": m["images"],
+            "errors": m["errors"],
+            "avg_batch_size": round(m["images"] / batches, 2),
+            "batch_fill_rate": round(m["images"] / (batches * self.max_batch_size), 3),
+            "avg_queue_wait_ms": round(m["queue_wait_total"] / images * 1000, 2),
+            "max_queue_wait_ms": round(m["queue_wait_max"] * 1000, 2),
+            "avg_batch_compute_ms": round(m["compute_total"] / batches * 1000, 2),
+        }
+
+
+def pixel_values(image_tensor):
+    # BLIP input for a CHW float [0, 1] tensor, so callers that already decoded
+    # and converted the image don't pay for the processor's PIL preprocessing
+    from torchvision.transforms import functional as F
+    processor, _ = model_registry.get("blip")
+    image_processor = processor.image_processor
+    size = [image_processor.size["height"], image_processor.size["width"]]
+    resized = F.resize(image_tensor, size, interpolation=F.InterpolationMode.BICUBIC, antialias=True)
+    return F.normalize(resized.clamp(0, 1), image_processor.image_mean, image_processor.image_std)
+
+
+def _blip_inputs(processor, items):
+    import torch
+    if not any(isinstance(item, torch.Tensor) for item in items):
+        images = [item.convert("RGB") for item in items]
+        return processor(images=images, return_tensors="pt")
+    from torchvision.transforms import functional as F
+    tensors = [item if isinstance(item, torch.Tensor) else pixel_values(F.to_tensor(item.convert("RGB")))
+               for item in items]
+    return {"pixel_values": torch.stack(tensors)}
+
+
+def _blip_caption_batch(items):
+    import torch
+    processor, model = model_registry.get("blip")
+    inputs = _blip_inputs(processor, items)
+    with inference_governor.slot("blip"), torch.no_grad():
+        out = model.generate(**inputs)
+    return processor.batch_decode(out, skip_special_tokens=True)
+
+
+# --- Streamed Captions ---
+def stream_caption(item, on_text):
+    # One image, not batched: on_text(piece) gets the caption as BLIP decodes
+    # it, word by word, and the whole caption is returned at the end
+    import torch
+    from transformers import TextStreamer
+
+    class _Streamer(TextStreamer):
+        def on_finalized_text(self, text, stream_end=False):
+            if text:
+                on_text(text)
+
+    processor, model = model_registry.get("blip")
+    inputs = _blip_inputs(processor, [item])
+    streamer = _Streamer(processor.tokenizer, skip_prompt=True, skip_special_tokens=True)
+    with inference_governor.slot("blip"), torch.no_grad():
+        out = model.generate(**inputs, streamer=streamer)
+    return processor.decode(out[0], skip_special_tokens=True)
+
+
+# Shared batcher used by every app in the process
+batcher = CaptionBatcher()
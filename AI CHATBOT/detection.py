@@ -0,0 +1,84 @@
+import os
+
+# --- Object Detection Settings and Post-processing ---
+# Faster R-CNN drops low-scoring boxes and caps detections inside its own ROI
+# heads (box_score_thresh / box_detections_per_img), so fewer boxes ever reach
+# Python. Per request, /upload can tighten that further:
+#
+#   ?score=0.7                  minimum confidence (never below OMNIBOT_DETECT_SCORE)
+#   ?max_detections=10          keep the best N
+#   ?classes=person,dog         only these COCO classes
+#
+# Filtering is done on whole tensors; each detection comes back as
+# {"label": "dog", "class_id": 18, "score": 0.97, "box": [x0, y0, x1, y1]}.
+
+SCORE_THRESHOLD = float(os.environ.get("OMNIBOT_DETECT_SCORE", "0.5"))
+MAX_DETECTIONS = int(os.environ.get("OMNIBOT_DETECT_MAX", "50"))
+NMS_THRESHOLD = float(os.environ.get("OMNIBOT_DETECT_NMS", "0.5"))
+DEFAULT_CLASSES = [c.strip().lower() for c in os.environ.get("OMNIBOT_DETECT_CLASSES", "").split(",") if c.strip()]
+
+# torchvision's COCO category names, indexed by label id ("N/A" ids are unused)
+COCO_LABELS = [
+    "__background__", "person", "bicycle", "car", "motorcycle", "airplane", "bus", "train", "truck", "boat",
+    "traffic light", "fire hydrant", "N/A", "stop sign", "parking meter", "bench", "bird", "cat", "dog", "horse",
+    "sheep", "cow", "elephant", "bear", "zebra", "giraffe", "N/A", "backpack", "umbrella", "N/A", "N/A",
+    "handbag", "tie", "suitcase", "frisbee", "skis", "snowboard", "sports ball", "kite", "baseball bat",
+    "baseball glove", "skateboard", "surfboard", "tennis racket", "bottle", "N/A", "wine glass", "cup", "fork",
+    "knife", "spoon", "bowl", "banana", "apple", "sandwich", "orange", "broccoli", "carrot", "hot dog", "pizza",
+    "donut", "cake", "chair", "couch", "potted plant", "bed", "N/A", "dining table", "N/A", "N/A", "toilet",
+    "N/A", "tv", "laptop", "mouse", "remote", "keyboard", "cell phone", "microwave", "oven", "toaster", "sink",
+    "refrigerator", "N/A", "book", "clock", "vase", "scissors", "teddy bear", "hair drier", "toothbrush",
+]
+LABEL_IDS = {name: index for index, name in enumerate(COCO_LABELS) if name not in ("N/A", "__background__")}
+
+
+def model_kwargs():
+    # Passed to torchvision's fasterrcnn builder so the ROI heads do the first cut
+    return {"box_score_thresh": SCORE_THRESHOLD, "box_detections_per_img": MAX_DETECTIONS,
+            "box_nms_thresh": NMS_THRESHOLD}
+
+
+def class_ids(names):
+    unknown = [name for name in names if name not in LABEL_IDS]
+    if unknown:
+        raise ValueError(f"Unknown object class: {', '.join(unknown)}")
+    return sorted(LABEL_IDS[name] for name in names)
+
+
+def parse_options(values):
+    # Request values -> options dict (also part of the detection cache key)
+    score = float(values.get("score") or SCORE_THRESHOLD)
+    limit = int(values.get("max_detections") or MAX_DETECTIONS)
+    names = [c.strip().lower() for c in values.get("classes", "").split(",") if c.strip()] or DEFAULT_CLASSES
+    return {"score": max(score, SCORE_THRESHOLD), "max": max(0, min(limit, MAX_DETECTIONS)), "classes": class_ids(names)}
+
+
+DEFAULT_OPTIONS = {"score": SCORE_THRESHOLD, "max": MAX_DETECTIONS, "classes": class_ids(DEFAULT_CLASSES)}
+
+
+def filter_detections(boxes, labels, scores, options=None):
+    # Score threshold and class allow-list as one boolean mask over the whole tensors
+    import torch
+    options = options or DEFAULT_OPTIONS
+    keep = scores >= options["score"]
+    if options["classes"]:
+        keep &= torch.isin(labels, torch.tensor(options["classes"], dtype=labels.dtype))
+    return boxes[keep], labels[keep], scores[keep]
+
+
+def limit_detections(boxes, labels, scores, options=None):
+    # Best `max` boxes by score; applied after tile NMS so duplicates don't use up slots
+    options = options or DEFAULT_OPTIONS
+    if len(scores) > options["max"]:
+        top = scores.topk(options["max"]).indices
+        boxes, labels, scores = boxes[top], labels[top], scores[top]
+    return boxes, labels, scores
+
+
+def to_json(boxes, labels, scores):
+    # One tolist() per tensor instead of .item() per element
+    return [
+        {"label": COCO_LABELS[label] if label < len(COCO_LABELS) else str(label), "class_id": label,
+         "score": round(score, 3), "box": [round(v, 1) for v in box]}
+        for box, label, score in zip(boxes.tolist(), labels.tolist(), scores.tolist())
+    ]
@@ -0,0 +1,294 @@
+import argparse
+import codecs
+import json
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# --- Streaming Document Extraction ---
+# PDF, DOCX and TXT uploads are extracted piece by piece: PDFs page by page,
+# DOCX and TXT as groups of paragraphs (lines for TXT) of at most CHUNK_CHARS.
+# With ?stream=1 (or Accept: application/x-ndjson) /upload sends each piece as
+# one NDJSON line as soon as it is ready, so memory stays bounded however
+# large the document is:
+#
+#   {"type": "text", "unit": "page", "range": [1, 1], "result": "..."}
+#   ...
+#   {"type": "done", "unit": "page", "count": 500}
+#
+# PDFs with at least OMNIBOT_PDF_PARALLEL_MIN_PAGES pages are split into page
+# ranges and extracted by a process pool of OMNIBOT_PDF_WORKERS processes
+# (default: the cores divided by OMNIBOT_WORKERS, the number of server
+# processes, so every server process can run its own pool without the pools
+# oversubscribing the machine); pages still come out in order. The speedup
+# needs more than one free core: on a single core the pool only adds overhead.
+# Benchmark with:
+#   python doc_extract.py benchmark --pages 300 --workers 1 2 4
+
+EXTENSIONS = ('.pdf', '.docx', '.txt')
+CHUNK_CHARS = int(os.environ.get("OMNIBOT_DOC_CHUNK_CHARS", "8000"))
+READ_BYTES = 64 * 1024
+SERVER_WORKERS = max(1, int(os.environ.get("OMNIBOT_WORKERS", "1")))
+PDF_WORKERS = int(os.environ.get("OMNIBOT_PDF_WORKERS", "0")) or max(1, (os.cpu_count() or 1) // SERVER_WORKERS)
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("OMNIBOT_PDF_PARALLEL_MIN_PAGES", "16"))
+PAGES_PER_TASK = 8
+
+
+def iter_pdf(file, timings=None, workers=PDF_WORKERS):
+    # Yields pages in order; extraction seconds per page are appended to `timings` if given
+    from PyPDF2 import PdfReader
+    reader = PdfReader(file)  # Reads pages from the (spooled) upload on demand
+    page_count = len(reader.pages)
+    if workers > 1 and page_count >= PDF_PARALLEL_MIN_PAGES:
+        yield from _iter_pdf_parallel(file, page_count, timings, workers)
+        return
+    for number, page in enumerate(reader.pages, start=1):
+        start = time.perf_counter()
+        text = page.extract_text() or ""
+        if timings is not None:
+            timings.append(time.perf_counter() - start)
+        yield "page", (number, number), text
+
+
+# --- Parallel PDF Extraction ---
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _pdf_context():
+    # Not fork: the pool is created from a request thread of a server that may
+    # hold loaded models and other threads' locks, none of which a PDF reader needs
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _pdf_pool(workers):
+    with _pools_lock:
+        if workers not in _pools:
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=_pdf_context())
+        return _pools[workers]
+
+
+def _extract_page_range(path, first, last):
+    # Runs in a worker process: one PdfReader per range, each page timed on its own
+    from PyPDF2 import PdfReader
+    reader = PdfReader(path)
+    pages = []
+    for index in range(first, last):
+        start = time.perf_counter()
+        text = reader.pages[index].extract_text() or ""
+        pages.append((text, time.perf_counter() - start))
+    return pages
+
+
+def _iter_pdf_parallel(file, page_count, timings, workers):
+    # Workers open a temp copy of the upload instead of receiving its bytes with every task
+    file.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        shutil.copyfileobj(file, tmp)
+    pool = _pdf_pool(workers)
+    step = max(1, min(PAGES_PER_TASK, -(-page_count // workers)))
+    ranges = deque((first, min(first + step, page_count)) for first in range(0, page_count, step))
+    pending = deque()
+    number = 0
+    try:
+        while ranges or pending:
+            # At most two ranges per worker in flight, so a slow reader can't pile up results
+            while ranges and len(pending) < workers * 2:
+                pending.append(pool.submit(_extract_page_range, tmp.name, *ranges.popleft()))
+            for text, seconds in pending.popleft().result():
+                number += 1
+                if timings is not None:
+                    timings.append(seconds)
+                yield "page", (number, number), text
+    finally:
+        for future in pending:
+            future.cancel()
+        for future in pending:
+            if not future.cancelled():
+                future.exception()  # Wait before removing the file it is reading
+        os.unlink(tmp.name)
+
+
+def _group_paragraphs(paragraphs):
+    # Whole paragraphs (each ending in "\n") grouped into chunks of about CHUNK_CHARS
+    buffer, size, start = [], 0, 1
+    number = 0
+    for number, paragraph in enumerate(paragraphs, start=1):
+        if buffer and size + len(paragraph) > CHUNK_CHARS:
+            yield "paragraph", (start, number - 1), "".join(buffer)
+            buffer, size, start = [], 0, number
+        buffer.append(paragraph)
+        size += len(paragraph)
+    if buffer:
+        yield "paragraph", (start, number), "".join(buffer)
+
+
+def iter_docx(file):
+    import docx
+    doc = docx.Document(file)  # python-docx parses the whole XML part; the output is still chunked
+    yield from _group_paragraphs(para.text + "\n" for para in doc.paragraphs)
+
+
+def _iter_lines(file):
+    # Incremental UTF-8 decode so a multi-byte character split across reads is handled
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    while True:
+        block = file.read(READ_BYTES)
+        pending += decoder.decode(block, final=not block)
+        lines = pending.splitlines(keepends=True)
+        pending = lines.pop() if lines and not lines[-1].endswith("\n") else ""
+        yield from lines
+        if not block:
+            break
+    if pending:
+        yield pending
+
+
+def iter_txt(file):
+    return _group_paragraphs(_iter_lines(file))
+
+
+def iter_document(file, filename, timings=None):
+    filename = filename.lower()
+    if filename.endswith('.pdf'):
+        return iter_pdf(file, timings)
+    if filename.endswith('.docx'):
+        return iter_docx(file)
+    if filename.endswith('.txt'):
+        return iter_txt(file)
+    raise ValueError("Unsupported file type")
+
+
+def extract_text(file, filename):
+    # Whole document as one string, built with a single join instead of repeated +=
+    return "".join(text for _, _, text in iter_document(file, filename))
+
+
+# --- Flask Integration ---
+def wants_stream(request):
+    return (request.values.get("stream", "").lower() in ("1", "true", "yes")
+            or "application/x-ndjson" in request.headers.get("Accept", ""))
+
+
+def ndjson_lines(file, filename, ingest=None):
+    # ingest(filename), if given, returns a sink (doc_index.open_document) that is
+    # given each piece as it is extracted and closed once the document is complete
+    document = ingest(filename) if ingest is not None else None
+    indexed = False
+    unit, count = None, 0
+    timings = []
+    try:
+        try:
+            for unit, (start, end), text in iter_document(file, filename, timings):
+                count = end
+                if document is not None:
+                    document.add((unit, (start, end), text))
+                line = {"type": "text", "unit": unit, "range": [start, end], "result": text}
+                if timings:
+                    line["seconds"] = round(timings[-1], 4)  # PDF pages only
+                yield json.dumps(line) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "message": str(e)}) + "\n"
+            return
+        if document is not None:
+            document.close()
+            indexed = True
+        yield json.dumps({"type": "done", "unit": unit, "count": count}) + "\n"
+    finally:
+        # A failed extraction, or one the client hung up on, leaves nothing in the index
+        if document is not None and not indexed:
+            document.discard()
+
+
+def stream_response(file, filename, ingest=None):
+    from flask import Response, stream_with_context
+    return Response(stream_with_context(ndjson_lines(file, filename, ingest)), mimetype="application/x-ndjson")
+
+
+# --- Benchmark ---
+def make_pdf(path, pages, lines_per_page=45):
+    # Minimal multi-page PDF (Helvetica text, no dependencies) for benchmarking
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        lines = [f"Page {page + 1} line {line}: the quick brown fox jumps over the lazy dog {page * line}"
+                 for line in range(lines_per_page)]
+        stream = "BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(f"({text}) Tj T*" for text in lines) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def benchmark(pages=300, worker_counts=(1, 2, 4)):
+    # Each worker count gets one untimed run first, so starting its process
+    # pool (and importing PyPDF2 in it) isn't counted as extraction time
+    report = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.pdf")
+        make_pdf(path, pages)
+        baseline = None
+        for workers in worker_counts:
+            with open(path, "rb") as f:
+                for _ in iter_pdf(f, workers=workers):
+                    pass
+            timings = []
+            with open(path, "rb") as f:
+                start = time.perf_counter()
+                text = "".join(part for _, _, part in iter_pdf(f, timings, workers=workers))
+                total = time.perf_counter() - start
+            baseline = baseline or total
+            per_page = sorted(timings)
+            report.append({
+                "workers": workers,
+                "seconds": round(total, 3),
+                "pages_per_second": round(pages / total, 1),
+                "speedup": round(baseline / total, 2),
+                "page_mean_ms": round(statistics.mean(per_page) * 1000, 2),
+                "page_p95_ms": round(per_page[int(len(per_page) * 0.95) - 1] * 1000, 2),
+                "chars": len(text),
+            })
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Document extraction tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    bench_cmd = commands.add_parser("benchmark", help="Serial vs parallel PDF extraction on a generated PDF "
+                                                      "(parallel only helps with more than one core)")
+    bench_cmd.add_argument("--pages", type=int, default=300)
+    bench_cmd.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args(argv)
+
+    print(f"{os.cpu_count() or 1} cores")
+    print(f"{'workers':>8}{'seconds':>10}{'pages/s':>10}{'speedup':>10}{'page ms':>10}{'p95 ms':>10}")
+    for row in benchmark(args.pages, args.workers):
+        print(f"{row['workers']:>8}{row['seconds']:>10}{row['pages_per_second']:>10}{row['speedup']:>10}"
+              f"{row['page_mean_ms']:>10}{row['page_p95_ms']:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,324 @@
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+
+# --- Uploaded Document Search ---
+# PDF/DOCX/TXT uploads are split into passages and indexed per session so chat
+# questions like "what does the document say about refunds" are answered by
+# retrieval instead of re-reading the file. Each session has an inverted index
+# (term -> {passage id: term count}) scored with BM25; OMNIBOT_DOC_SCORING=tfidf
+# switches to cosine TF-IDF computed with NumPy. Indexes live in this process
+# only and are bounded by documents per session, number of sessions and total
+# indexed characters; the least recently used documents are evicted first.
+
+MAX_DOCS_PER_SESSION = int(os.environ.get("OMNIBOT_DOC_MAX_DOCS", "5"))
+MAX_SESSIONS = int(os.environ.get("OMNIBOT_DOC_MAX_SESSIONS", "200"))
+MAX_CHARS = int(os.environ.get("OMNIBOT_DOC_MAX_CHARS", str(50 * 1024 * 1024)))
+SCORING = os.environ.get("OMNIBOT_DOC_SCORING", "bm25")
+PASSAGE_CHARS = 600
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by does for from has have how i in is it me my of on or say says "
+    "tell that the this to was what when where which who why with about document file pdf".split())
+QUESTION_RE = re.compile(r"(?:say|says|mention|mentions|about|on|regarding)\s+(.+)$")
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def split_passages(pieces):
+    # (unit, (start, end), text) pieces from doc_extract -> passages of ~PASSAGE_CHARS
+    # that remember which pages / paragraphs they came from
+    for unit, span, text in pieces:
+        text = " ".join(text.split())
+        while text:
+            cut = len(text)
+            if cut > PASSAGE_CHARS:
+                # Prefer a sentence end, then a space, then a hard cut
+                cut = text.rfind(". ", 0, PASSAGE_CHARS) + 1 or text.rfind(" ", 0, PASSAGE_CHARS) + 1 or PASSAGE_CHARS
+            yield unit, span, text[:cut].strip()
+            text = text[cut:].lstrip()
+
+
+def prepare(pieces):
+    # Splitting and tokenizing happen here, outside any lock
+    passages = []
+    for unit, span, text in split_passages(pieces):
+        terms = Counter(tokenize(text))
+        if terms:
+            passages.append((unit, span, text, terms))
+    return passages
+
+
+class DocumentIndex:
+    # BM25 index over every passage of one session's documents
+    def __init__(self):
+        self.documents = OrderedDict()  # doc id -> {"name", "passages": [passage ids], "chars"}
+        self.passages = {}  # passage id -> (doc id, unit, span, text, length in tokens)
+        self.postings = {}  # term -> {passage id: term count}
+        self.total_length = 0
+        self.chars = 0
+        self._next_id = 0
+        self._tfidf = None  # cached NumPy norms, rebuilt after every change
+
+    def add(self, name, passages):
+        # `passages` come from prepare()
+        doc_id = self._next_id
+        self._next_id += 1
+        passage_ids, chars = [], 0
+        for unit, span, text, terms in passages:
+            pid = self._next_id
+            self._next_id += 1
+            length = sum(terms.values())
+            self.passages[pid] = (doc_id, unit, span, text, length)
+            for term, count in terms.items():
+                self.postings.setdefault(term, {})[pid] = count
+            self.total_length += length
+            chars += len(text)
+            passage_ids.append(pid)
+        self.documents[doc_id] = {"name": name, "passages": passage_ids, "chars": chars}
+        self.chars += chars
+        self._tfidf = None
+        return doc_id
+
+    def remove(self, doc_id):
+        document = self.documents.pop(doc_id)
+        for pid in document["passages"]:
+            _, _, _, text, length = self.passages.pop(pid)
+            for term in set(tokenize(text)):
+                postings = self.postings[term]
+                del postings[pid]
+                if not postings:
+                    del self.postings[term]
+            self.total_length -= length
+        self.chars -= document["chars"]
+        self._tfidf = None
+
+    def search(self, query, k=3, scoring=SCORING):
+        terms = tokenize(query)
+        if not terms or not self.passages:
+            return []
+        scores = self._tfidf_scores(terms) if scoring == "tfidf" else self._bm25_scores(terms)
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(score, self.documents[self.passages[pid][0]]["name"]) + self.passages[pid][1:4]
+                for pid, score in best if score > 0]
+
+    def _bm25_scores(self, terms):
+        n = len(self.passages)
+        avg_length = self.total_length / n
+        scores = {}
+        for term in set(terms):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for pid, count in postings.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.passages[pid][4] / avg_length)
+                scores[pid] = scores.get(pid, 0.0) + idf * count * (BM25_K1 + 1) / (count + norm)
+        return scores
+
+    def _tfidf_scores(self, terms):
+        # Cosine similarity of sparse TF-IDF vectors; only the query terms' postings are touched
+        try:
+            import numpy as np
+        except ImportError:
+            raise RuntimeError("OMNIBOT_DOC_SCORING=tfidf needs NumPy (pip install numpy)")
+        n = len(self.passages)
+        if self._tfidf is None:
+            pids = np.fromiter(self.passages, dtype=np.int64, count=n)
+            norms = np.zeros(n)
+            slot = {pid: i for i, pid in enumerate(pids.tolist())}
+            for postings in self.postings.values():
+                idf = math.log(n / len(postings)) + 1
+                rows = np.fromiter((slot[pid] for pid in postings), dtype=np.int64, count=len(postings))
+                weights = np.fromiter(postings.values(), dtype=np.float64, count=len(postings)) * idf
+                np.add.at(norms, rows, weights ** 2)
+            self._tfidf = (pids, slot, np.sqrt(norms))
+        pids, slot, norms = self._tfidf
+
+        scores = np.zeros(n)
+        for term, query_count in Counter(terms).items():
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(n / len(postings)) + 1
+            rows = np.fromiter((slot[pid] for pid in postings), dtype=np.int64, count=len(postings))
+            weights = np.fromiter(postings.values(), dtype=np.float64, count=len(postings)) * idf
+            np.add.at(scores, rows, weights * query_count * idf)
+        hits = np.nonzero(scores)[0]
+        return dict(zip(pids[hits].tolist(), (scores[hits] / norms[hits]).tolist()))
+
+
+class PendingDocument:
+    # A document still being extracted: each piece is split and tokenized as it
+    # arrives, so only passages (up to the character budget) are held until close()
+    def __init__(self, store, session_id, name):
+        self.store = store
+        self.session_id = session_id
+        self.name = name
+        self.passages = []
+        self.chars = 0
+        self.full = False
+
+    def add(self, piece):
+        if self.full:
+            return
+        for passage in prepare([piece]):
+            self.chars += len(passage[2])
+            if self.chars > self.store.max_chars:
+                self.full = True  # A document bigger than the whole budget is indexed only up to it
+                return
+            self.passages.append(passage)
+
+    def close(self):
+        return self.store.insert(self.session_id, self.name, self.passages)
+
+    def discard(self):
+        self.passages = []
+        self.full = True
+
+
+class IndexStore:
+    # session id -> DocumentIndex, with global limits on sessions and characters
+    def __init__(self, max_docs=MAX_DOCS_PER_SESSION, max_sessions=MAX_SESSIONS, max_chars=MAX_CHARS):
+        self.max_docs = max_docs
+        self.max_sessions = max_sessions
+        self.max_chars = max_chars
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"documents_added": 0, "evictions": 0, "searches": 0, "search_seconds": 0.0}
+
+    def open(self, session_id, name):
+        return PendingDocument(self, session_id, name)
+
+    def add(self, session_id, name, pieces):
+        document = self.open(session_id, name)
+        for piece in pieces:
+            document.add(piece)
+        return document.close()
+
+    def insert(self, session_id, name, passages):
+        with self._lock:
+            index = self._indexes.pop(session_id, None) or DocumentIndex()
+            self._indexes[session_id] = index
+            doc_id = index.add(name, passages)
+            self._stats["documents_added"] += 1
+            while len(index.documents) > self.max_docs:
+                index.remove(next(iter(index.documents)))
+                self._stats["evictions"] += 1
+            self._evict()
+            return doc_id
+
+    def _evict(self):
+        while len(self._indexes) > self.max_sessions:
+            _, index = self._indexes.popitem(last=False)
+            self._stats["evictions"] += len(index.documents)
+        chars = sum(index.chars for index in self._indexes.values())
+        while self._indexes and chars > self.max_chars:
+            # Oldest document of the least recently used session goes first
+            session_id, index = next(iter(self._indexes.items()))
+            if index.documents:
+                before = index.chars
+                index.remove(next(iter(index.documents)))
+                chars -= before - index.chars
+                self._stats["evictions"] += 1
+            if not index.documents:
+                del self._indexes[session_id]
+
+    def search(self, session_id, query, k=3):
+        start = time.perf_counter()
+        with self._lock:
+            index = self._indexes.get(session_id)
+            if index is None:
+                return None
+            self._indexes.move_to_end(session_id)
+            results = index.search(query, k)
+            self._stats["searches"] += 1
+            self._stats["search_seconds"] += time.perf_counter() - start
+        return results
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["sessions"] = len(self._indexes)
+            stats["documents"] = sum(len(index.documents) for index in self._indexes.values())
+            stats["passages"] = sum(len(index.passages) for index in self._indexes.values())
+            stats["chars"] = sum(index.chars for index in self._indexes.values())
+        searches = stats["searches"]
+        search_seconds = stats.pop("search_seconds")
+        stats["mean_search_ms"] = round(search_seconds / searches * 1000, 3) if searches else 0.0
+        stats["scoring"] = SCORING
+        return stats
+
+
+# Shared store used by /upload and the chat "document" intent
+store = IndexStore()
+
+
+# --- Chat Integration ---
+def add_document(name, pieces):
+    import session_store
+    return store.add(session_store.current_session_id(), name, pieces)
+
+
+def open_document(name):
+    # Incremental form of add_document, for extraction that streams pieces out
+    import session_store
+    return store.open(session_store.current_session_id(), name)
+
+
+def _where(unit, span):
+    start, end = span
+    label = unit if start == end else unit + "s"
+    return f"{label} {start}" if start == end else f"{label} {start}-{end}"
+
+
+def answer(message, k=3):
+    # None (fall through to the other intents) when this session has no documents
+    import session_store
+    match = QUESTION_RE.search(message)
+    query = match.group(1) if match else message
+    results = store.search(session_store.current_session_id(), query, k)
+    if results is None:
+        return None
+    if not results:
+        return "I couldn't find anything about that in your documents."
+    lines = [f"📄 {name} ({_where(unit, span)}): {text[:300]}" for _, name, unit, span, text in results]
+    return "\n".join(lines)
+
+
+# --- Benchmark ---
+# python doc_index.py  -> indexing and query cost on a synthetic document
+def benchmark(pages=300, queries=500):
+    import random
+    rng = random.Random(3)
+    vocabulary = ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(3, 9))) for _ in range(5000)]
+    pieces = [("page", (page, page), " ".join(rng.choices(vocabulary, k=400)) + ".") for page in range(1, pages + 1)]
+    index = DocumentIndex()
+    start = time.perf_counter()
+    index.add("bench.txt", prepare(pieces))
+    timings = {"index_ms": (time.perf_counter() - start) * 1000, "passages": len(index.passages)}
+    for scoring in ("bm25", "tfidf"):
+        try:
+            index.search("warmup", scoring=scoring)
+        except RuntimeError:
+            continue
+        start = time.perf_counter()
+        for _ in range(queries):
+            index.search(" ".join(rng.choices(vocabulary, k=3)), scoring=scoring)
+        timings[f"{scoring}_query_ms"] = (time.perf_counter() - start) / queries * 1000
+    return {name: round(value, 3) for name, value in timings.items()}
+
+
+if __name__ == "__main__":
+    for name, value in benchmark().items():
+        print(f"{name:>16}: {value}")
+    sys.exit(0)
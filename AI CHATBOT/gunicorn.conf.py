@@ -0,0 +1,61 @@
+import gc
+import os
+
+# --- Gunicorn Settings ---
+#   cd "AI CHATBOT" && gunicorn wsgi:app
+#
+# The app and its models are loaded once in the master (preload_app) and the
+# workers are forked from it, so model weights are shared copy-on-write
+# instead of being loaded once per worker. Each worker serves a few request
+# threads; how many inferences run at once and with how many torch threads is
+# decided per worker by inference_governor.py from the cores and OMNIBOT_WORKERS.
+#
+# One worker by default. Sessions can be shared (sqlite/redis), but uploaded
+# document indexes, background jobs and the analysis / math / Wikipedia caches
+# live in each worker process. With OMNIBOT_WORKERS > 1, put the workers behind
+# a proxy with sticky routing (e.g. nginx `hash $cookie_omnibot_sid`) so a
+# browser's follow-up questions and /jobs/<id> polls reach the worker that
+# holds its documents and jobs; otherwise they intermittently 404 or miss.
+
+CORES = os.cpu_count() or 1
+
+bind = os.environ.get("OMNIBOT_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("OMNIBOT_WORKERS", "1"))
+worker_class = "gthread"
+threads = int(os.environ.get("OMNIBOT_THREADS", "4"))
+timeout = int(os.environ.get("OMNIBOT_TIMEOUT", "120"))
+preload_app = True
+
+# Read by wsgi.create_app() in the master, and by inference_governor in every worker
+os.environ["OMNIBOT_WORKERS"] = str(workers)
+os.environ.setdefault("OMNIBOT_PRELOAD_MODELS", "all")
+# The memory session store is per process, so with several workers a follow-up
+# question would land on a worker that never saw the first one
+if workers > 1:
+    if os.environ.get("OMNIBOT_SESSION_BACKEND") == "memory":
+        raise RuntimeError("OMNIBOT_SESSION_BACKEND=memory keeps sessions per worker process; "
+                           "use sqlite or redis when OMNIBOT_WORKERS is more than 1")
+    os.environ.setdefault("OMNIBOT_SESSION_BACKEND", "sqlite")
+# The master never runs inference; keeping its OpenMP pool single-threaded makes fork() safe
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+os.environ.setdefault("MKL_NUM_THREADS", "1")
+
+
+def when_ready(server):
+    # Objects that exist now (the preloaded models included) are moved out of the
+    # collector's reach, so GC passes in the workers don't write to their pages
+    gc.collect()
+    gc.freeze()
+    import inference_governor
+    server.log.info("Preloaded models shared by %d workers, %d concurrent inferences x %d torch threads each",
+                    workers, inference_governor.MAX_CONCURRENT, inference_governor.INTRA_THREADS)
+    if workers > 1:
+        server.log.warning("%d workers: document indexes, background jobs and caches are per worker; "
+                           "route each client to one worker (sticky sessions) or set OMNIBOT_WORKERS=1", workers)
+
+
+def post_fork(server, worker):
+    import model_registry
+    import inference_governor
+    model_registry.after_fork()
+    inference_governor.configure_torch()
@@ -0,0 +1,316 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+# --- Inference Backends ---
+# Each vision model can run as plain fp32 eager PyTorch, with dynamic int8
+# quantization, as an exported TorchScript module, or through ONNX Runtime.
+# Pick one per model with OMNIBOT_BACKEND_<MODEL> (e.g. OMNIBOT_BACKEND_DEEPLABV3=onnx)
+# or for all models with OMNIBOT_INFERENCE_BACKEND. Exported files are created
+# offline with:  python inference_backends.py export --model deeplabv3 --backend onnx
+
+BACKENDS = ("eager", "int8", "torchscript", "onnx")
+EXPORT_DIR = os.environ.get("OMNIBOT_EXPORT_DIR", "exports")
+
+# BLIP's autoregressive generate() can't be traced or exported as a single graph,
+# so it only supports the in-process backends.
+SUPPORTED = {
+    "blip": ("eager", "int8"),
+    "deeplabv3": BACKENDS,
+    "fasterrcnn": BACKENDS,
+    "mobilenet_v3": ("eager", "int8"),  # weapon screening; small enough that exports don't pay off
+}
+
+
+def backend_for(name):
+    backend = os.environ.get(f"OMNIBOT_BACKEND_{name.upper()}") or os.environ.get("OMNIBOT_INFERENCE_BACKEND", "eager")
+    backend = backend.lower()
+    if backend not in SUPPORTED.get(name, ("eager",)):
+        return "eager"
+    return backend
+
+
+def export_path(name, backend, out_dir=None):
+    extension = {"torchscript": "pt", "onnx": "onnx"}[backend]
+    return os.path.join(out_dir or EXPORT_DIR, f"{name}.{extension}")
+
+
+def load(name, build_eager, backend=None):
+    backend = backend or backend_for(name)
+    if backend == "eager":
+        return build_eager()
+    if backend == "int8":
+        value = build_eager()
+        # BLIP loads as (processor, model); only the model part is quantized
+        if isinstance(value, tuple):
+            return value[:-1] + (quantize_int8(value[-1]),)
+        return quantize_int8(value)
+    return load_exported(name, backend)
+
+
+def quantize_int8(model):
+    # Dynamic quantization converts Linear/LSTM weights to int8. Conv-heavy
+    # models (DeepLabV3, the Faster R-CNN backbone) only gain in their Linear heads.
+    import torch
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+# --- Exported Model Wrappers ---
+# Wrappers give exported models the same call signature as the eager
+# torchvision models so vision_pipeline doesn't care which backend is active.
+class _SegmentationOutput:
+    def __init__(self, run):
+        self._run = run
+
+    def __call__(self, batch):
+        return {"out": self._run(batch)}
+
+
+class _ScriptedDetector:
+    def __init__(self, module):
+        self._module = module
+
+    def __call__(self, batch):
+        # Scripted torchvision detectors take a list of images and return (losses, detections)
+        _, detections = self._module(list(batch))
+        return detections
+
+
+class _OnnxDetector:
+    def __init__(self, session):
+        self._session = session
+
+    def __call__(self, batch):
+        import torch
+        detections = []
+        for image in batch:
+            boxes, labels, scores = self._session.run(None, {"image": image.numpy()})
+            detections.append({
+                "boxes": torch.from_numpy(boxes),
+                "labels": torch.from_numpy(labels),
+                "scores": torch.from_numpy(scores),
+            })
+        return detections
+
+
+def _onnx_session(path):
+    try:
+        import onnxruntime as ort
+    except ImportError:
+        raise RuntimeError("The onnx backend needs onnxruntime (pip install onnxruntime)")
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+
+def load_exported(name, backend):
+    import torch
+    path = export_path(name, backend)
+    if not os.path.exists(path):
+        raise RuntimeError(f"No {backend} export for {name} at {path}; run: "
+                           f"python inference_backends.py export --model {name} --backend {backend}")
+
+    if backend == "torchscript":
+        module = torch.jit.load(path)
+        module.eval()
+        if name == "fasterrcnn":
+            return _ScriptedDetector(module)
+        return _SegmentationOutput(module)
+
+    session = _onnx_session(path)
+    if name == "fasterrcnn":
+        return _OnnxDetector(session)
+    return _SegmentationOutput(
+        lambda batch: torch.from_numpy(session.run(["out"], {"input": batch.numpy()})[0]))
+
+
+# --- Offline Export ---
+def _eager_builder(name):
+    import model_registry
+    return model_registry.EAGER_BUILDERS[name]
+
+
+def _segmentation_head(model):
+    # Export only the main "out" head; the auxiliary classifier is unused at inference
+    import torch
+
+    class SegmentationHead(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, x):
+            return self.inner(x)["out"]
+
+    return SegmentationHead(model).eval()
+
+
+def export(name, backend, out_dir=None):
+    import torch
+    if backend not in ("torchscript", "onnx") or backend not in SUPPORTED[name]:
+        raise ValueError(f"{name} can't be exported as {backend}")
+    path = export_path(name, backend, out_dir)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    model = _eager_builder(name)()
+
+    with torch.no_grad():
+        if name == "deeplabv3":
+            head = _segmentation_head(model)
+            dummy = torch.rand(1, 3, 520, 520)
+            if backend == "torchscript":
+                torch.jit.trace(head, dummy).save(path)
+            else:
+                torch.onnx.export(head, dummy, path, opset_version=17,
+                                  input_names=["input"], output_names=["out"],
+                                  dynamic_axes={"input": {0: "batch", 2: "height", 3: "width"},
+                                                "out": {0: "batch", 2: "height", 3: "width"}})
+        else:
+            if backend == "torchscript":
+                torch.jit.script(model).save(path)
+            else:
+                dummy = torch.rand(3, 480, 640)
+                torch.onnx.export(model, ([dummy],), path, opset_version=11,
+                                  input_names=["image"], output_names=["boxes", "labels", "scores"],
+                                  dynamic_axes={"image": {1: "height", 2: "width"},
+                                                "boxes": {0: "detections"}, "labels": {0: "detections"},
+                                                "scores": {0: "detections"}})
+    return path
+
+
+# --- Accuracy vs Latency Comparison ---
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+def _load_images(directory):
+    from PIL import Image
+    names = sorted(n for n in os.listdir(directory) if n.lower().endswith(IMAGE_EXTENSIONS))
+    if not names:
+        raise ValueError(f"No images found in {directory}")
+    return [(n, Image.open(os.path.join(directory, n)).convert("RGB")) for n in names]
+
+
+def _run_model(name, model, image):
+    import torch
+    from torchvision.transforms import functional as F
+    with torch.no_grad():
+        if name == "blip":
+            processor, blip = model
+            inputs = processor(images=image, return_tensors="pt")
+            return processor.decode(blip.generate(**inputs)[0], skip_special_tokens=True)
+        tensor = F.to_tensor(image)
+        if name == "deeplabv3":
+            tensor = F.normalize(tensor, [0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
+            return model(tensor.unsqueeze(0))["out"][0].argmax(0)
+        if name == "mobilenet_v3":
+            tensor = F.normalize(F.resize(tensor, [224, 224], antialias=True), [0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
+            return model(tensor.unsqueeze(0))[0].argmax().item()
+        detections = model(tensor.unsqueeze(0))[0]
+        keep = detections["scores"] > 0.5
+        return detections["boxes"][keep], detections["labels"][keep]
+
+
+def _agreement(name, reference, output):
+    # How closely a backend reproduces the eager fp32 result, in [0, 1]
+    if name == "blip":
+        ref_words, out_words = set(reference.split()), set(output.split())
+        union = ref_words | out_words
+        return len(ref_words & out_words) / len(union) if union else 1.0
+    if name == "deeplabv3":
+        return (reference == output).float().mean().item()
+    if name == "mobilenet_v3":
+        return float(reference == output)  # same top-1 class
+
+    from torchvision.ops import box_iou
+    ref_boxes, ref_labels = reference
+    out_boxes, out_labels = output
+    if len(ref_boxes) == 0 and len(out_boxes) == 0:
+        return 1.0
+    if len(ref_boxes) == 0 or len(out_boxes) == 0:
+        return 0.0
+    iou = box_iou(ref_boxes, out_boxes)
+    iou[ref_labels[:, None] != out_labels[None, :]] = 0
+    matched = int((iou.max(dim=1).values >= 0.5).sum())
+    # F1 of matched boxes against the eager detections
+    return 2 * matched / (len(ref_boxes) + len(out_boxes))
+
+
+def compare(name, image_dir, runs=3):
+    images = _load_images(image_dir)
+    builder = _eager_builder(name)
+    report = []
+    reference = None
+
+    for backend in SUPPORTED[name]:
+        try:
+            model = load(name, builder, backend=backend)
+        except Exception as e:
+            report.append({"backend": backend, "skipped": str(e)})
+            continue
+
+        _run_model(name, model, images[0][1])  # warm-up
+        timings, outputs = [], []
+        for _, image in images:
+            for _ in range(runs):
+                start = time.perf_counter()
+                output = _run_model(name, model, image)
+                timings.append(time.perf_counter() - start)
+            outputs.append(output)
+
+        if reference is None:
+            reference = outputs  # eager fp32 is always first
+        agreement = [_agreement(name, ref, out) for ref, out in zip(reference, outputs)]
+        timings.sort()
+        report.append({
+            "backend": backend,
+            "mean_ms": round(statistics.mean(timings) * 1000, 1),
+            "p95_ms": round(timings[int(0.95 * (len(timings) - 1))] * 1000, 1),
+            "agreement": round(statistics.mean(agreement), 4),
+        })
+    return report
+
+
+def _print_report(name, report):
+    print(f"\n{name}")
+    print(f"{'backend':<12}{'mean ms':>10}{'p95 ms':>10}{'agreement':>12}")
+    for row in report:
+        if "skipped" in row:
+            print(f"{row['backend']:<12}  skipped: {row['skipped']}")
+        else:
+            print(f"{row['backend']:<12}{row['mean_ms']:>10}{row['p95_ms']:>10}{row['agreement']:>12}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export vision models and compare inference backends")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = commands.add_parser("export", help="Write a TorchScript or ONNX export of a model")
+    export_cmd.add_argument("--model", choices=["deeplabv3", "fasterrcnn"], required=True)
+    export_cmd.add_argument("--backend", choices=["torchscript", "onnx"], required=True)
+    export_cmd.add_argument("--out", default=EXPORT_DIR)
+
+    compare_cmd = commands.add_parser("compare", help="Accuracy vs latency of every backend on a local image set")
+    compare_cmd.add_argument("--images", required=True, help="Directory of test images")
+    compare_cmd.add_argument("--model", choices=sorted(SUPPORTED), action="append")
+    compare_cmd.add_argument("--runs", type=int, default=3)
+    compare_cmd.add_argument("--json", help="Also write the report to this file")
+
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        print(export(args.model, args.backend, args.out))
+        return 0
+
+    reports = {}
+    for name in args.model or sorted(SUPPORTED):
+        reports[name] = compare(name, args.images, runs=args.runs)
+        _print_report(name, reports[name])
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
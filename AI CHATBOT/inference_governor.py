@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import request_metrics
+
+# --- Inference Concurrency Governor ---
+# Every model call (BLIP, DeepLabV3, Faster R-CNN, the weapon screen) runs
+# inside slot(), which lets at most MAX_CONCURRENT inferences run at once in
+# this process; the others wait their turn. Together with a fixed torch thread
+# count this keeps the cores from being oversubscribed when many requests
+# arrive together: each running model gets its share of the cores instead of
+# every request starting a full-size OpenMP pool.
+#
+#   cores per worker = cores / OMNIBOT_WORKERS (server processes)
+#   intra-op threads = cores per worker / MAX_CONCURRENT
+#
+# GET /inference-metrics reports time spent waiting for a slot separately from
+# the time the model itself took.
+
+CORES = os.cpu_count() or 1
+WORKERS = max(1, int(os.environ.get("OMNIBOT_WORKERS", "1")))
+CORES_PER_WORKER = max(1, CORES // WORKERS)
+MAX_CONCURRENT = max(1, int(os.environ.get("OMNIBOT_MAX_INFERENCES", str(max(1, CORES_PER_WORKER // 4)))))
+INTRA_THREADS = max(1, int(os.environ.get("OMNIBOT_TORCH_THREADS", str(max(1, CORES_PER_WORKER // MAX_CONCURRENT)))))
+INTEROP_THREADS = max(1, int(os.environ.get("OMNIBOT_TORCH_INTEROP_THREADS", "1")))
+SAMPLES = 512  # recent calls per model kept for the percentiles
+
+
+def configure_torch():
+    # Called once per process before the first inference (and by gunicorn's post_fork)
+    try:
+        import torch
+    except ImportError:
+        return False
+    torch.set_num_threads(INTRA_THREADS)
+    try:
+        torch.set_num_interop_threads(INTEROP_THREADS)
+    except RuntimeError:
+        pass  # Only allowed before torch has started any inter-op work
+    return True
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Governor:
+    def __init__(self, max_concurrent=MAX_CONCURRENT):
+        self.max_concurrent = max_concurrent
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._configured = False
+        self._active = 0
+        self._waiting = 0
+        self._models = {}
+
+    @contextmanager
+    def slot(self, name):
+        # with governor.slot("deeplabv3"): output = model(batch)
+        if not self._configured:
+            self._configured = configure_torch()
+        with self._lock:
+            self._waiting += 1
+        start = time.perf_counter()
+        self._slots.acquire()
+        acquired = time.perf_counter()
+        with self._lock:
+            self._waiting -= 1
+            self._active += 1
+        try:
+            yield
+        finally:
+            finished = time.perf_counter()
+            self._slots.release()
+            with self._lock:
+                self._active -= 1
+                self._record(name, acquired - start, finished - acquired)
+
+    def _record(self, name, wait, compute):
+        request_metrics.observe(request_metrics.model_waits, name, wait)
+        request_metrics.observe(request_metrics.models, name, compute, "model-" + name)
+        m = self._models.get(name)
+        if m is None:
+            m = self._models[name] = {"calls": 0, "wait_total": 0.0, "compute_total": 0.0,
+                                      "waits": deque(maxlen=SAMPLES), "computes": deque(maxlen=SAMPLES)}
+        m["calls"] += 1
+        m["wait_total"] += wait
+        m["compute_total"] += compute
+        m["waits"].append(wait)
+        m["computes"].append(compute)
+
+    def stats(self):
+        with self._lock:
+            models = {name: dict(m, waits=list(m["waits"]), computes=list(m["computes"]))
+                      for name, m in self._models.items()}
+            stats = {
+                "max_concurrent": self.max_concurrent,
+                "active": self._active,
+                "waiting": self._waiting,
+                "intra_op_threads": INTRA_THREADS,
+                "inter_op_threads": INTEROP_THREADS,
+                "cores": CORES,
+                "workers": WORKERS,
+            }
+        stats["models"] = {
+            name: {
+                "calls": m["calls"],
+                "mean_wait_ms": round(m["wait_total"] / m["calls"] * 1000, 2),
+                "p95_wait_ms": round(_percentile(m["waits"], 0.95) * 1000, 2),
+                "mean_compute_ms": round(m["compute_total"] / m["calls"] * 1000, 2),
+                "p95_compute_ms": round(_percentile(m["computes"], 0.95) * 1000, 2),
+            }
+            for name, m in models.items()
+        }
+        return stats
+
+
+# Shared by every model call in this process
+governor = Governor()
+
+
+def slot(name):
+    return governor.slot(name)
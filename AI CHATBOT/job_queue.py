@@ -0,0 +1,306 @@
+import asyncio
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+# --- Background Jobs ---
+# Heavy /upload work can run as a job: the request only enqueues it and gets a
+# job id back (202), a fixed pool of worker threads does the work, and the
+# client polls GET /jobs/<id> or follows GET /jobs/<id>/events (server-sent
+# events) for progress and the result. The queue is bounded; when it is full
+# submit() raises QueueFull and the route answers 429 with Retry-After.
+#
+# Jobs live in this process, so with several server processes the polling
+# request must reach the process that accepted the upload (sticky sessions).
+
+WORKERS = int(os.environ.get("OMNIBOT_JOB_WORKERS", "2"))
+MAX_QUEUE = int(os.environ.get("OMNIBOT_JOB_MAX_QUEUE", "16"))
+TTL = float(os.environ.get("OMNIBOT_JOB_TTL", "600"))  # seconds a finished job stays readable
+MAX_FINISHED = int(os.environ.get("OMNIBOT_JOB_MAX_FINISHED", "256"))  # finished jobs kept at most
+RETRY_AFTER = 2  # seconds suggested to clients that got a 429
+KEEPALIVE = 15.0  # seconds between SSE comments while nothing happens
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, fn, args, kwargs):
+        self.id = secrets.token_urlsafe(12)
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.status = "queued"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.stages = OrderedDict()  # stage name -> seconds
+        self.events = []
+        self.result = None
+        self.error = None
+        self._changed = threading.Condition()
+        self._watchers = set()  # (event loop, asyncio.Event) of wait_async() callers
+
+    @contextmanager
+    def stage(self, name):
+        # Times one step of the job and reports it as progress
+        self._emit({"event": "stage", "stage": name, "state": "started"})
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        # For steps timed elsewhere, e.g. models running in parallel
+        with self._changed:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+            self._emit({"event": "stage", "stage": name, "state": "finished", "seconds": round(seconds, 4)})
+
+    def _emit(self, event):
+        with self._changed:
+            self.events.append(dict(event, time=round(time.time() - self.created, 4)))
+            self._notify()
+
+    def _set(self, status, **fields):
+        with self._changed:
+            self.status = status
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.events.append({"event": "status", "status": status, "time": round(time.time() - self.created, 4)})
+            self._notify()
+
+    def _notify(self):
+        # Called with self._changed held
+        self._changed.notify_all()
+        for loop, changed in self._watchers:
+            try:
+                loop.call_soon_threadsafe(changed.set)
+            except RuntimeError:
+                pass  # That loop has closed
+
+    @property
+    def done(self):
+        return self.status in ("done", "error")
+
+    def wait(self, cursor, timeout):
+        # New events after `cursor`, waiting up to `timeout` seconds for one to arrive
+        with self._changed:
+            if cursor >= len(self.events) and not self.done:
+                self._changed.wait(timeout)
+            return self.events[cursor:]
+
+    async def wait_async(self, cursor, timeout):
+        # wait() for the asyncio app: the caller awaits an asyncio.Event instead of holding a thread
+        changed = asyncio.Event()
+        watcher = (asyncio.get_running_loop(), changed)
+        with self._changed:
+            if cursor < len(self.events) or self.done:
+                return self.events[cursor:]
+            self._watchers.add(watcher)
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._changed:
+                self._watchers.discard(watcher)
+        with self._changed:
+            return self.events[cursor:]
+
+    def to_dict(self):
+        with self._changed:
+            stages = {name: round(seconds, 4) for name, seconds in self.stages.items()}
+        info = {
+            "job_id": self.id,
+            "status": self.status,
+            "queue_wait_seconds": round((self.started or time.time()) - self.created, 4),
+            "stages": stages,
+        }
+        if self.finished:
+            info["total_seconds"] = round(self.finished - self.created, 4)
+        if self.status == "done":
+            info["result"] = self.result
+        elif self.status == "error":
+            info["message"] = self.error
+        return info
+
+
+class JobQueue:
+    def __init__(self, workers=WORKERS, max_queue=MAX_QUEUE, ttl=TTL, max_finished=MAX_FINISHED):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.ttl = ttl
+        self.max_finished = max_finished
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._jobs = {}
+        self._finished = deque()  # job ids in the order they finished
+        self._lock = threading.Lock()
+        self._threads = []
+        self._running = 0
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0,
+                       "queue_wait_seconds": 0.0, "run_seconds": 0.0}
+        self._stage_totals = {}
+
+    def _start(self):
+        # Worker threads are started on first use so importing the module stays cheap
+        if self._threads:
+            return
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fn, *args, **kwargs):
+        # fn(job, *args, **kwargs) runs on a worker thread; its return value is the job result
+        job = Job(fn, args, kwargs)
+        with self._lock:
+            self._start()
+            self._purge()
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self._stats["rejected"] += 1
+                raise QueueFull(f"{self.max_queue} jobs already waiting")
+            self._jobs[job.id] = job
+            self._stats["submitted"] += 1
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _purge(self):
+        # Results can be large (segmentation PNGs), so finished jobs are bounded by age and count
+        now = time.time()
+        while self._finished:
+            job = self._jobs[self._finished[0]]
+            if len(self._finished) <= self.max_finished and now - job.finished < self.ttl:
+                break
+            del self._jobs[self._finished.popleft()]
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                self._running += 1
+            job._set("running", started=time.time())
+            try:
+                result = job.fn(job, *job.args, **job.kwargs)
+            except Exception as e:
+                job._set("error", error=str(e), finished=time.time())
+            else:
+                job._set("done", result=result, finished=time.time())
+            with self._lock:
+                self._running -= 1
+                self._stats["completed" if job.status == "done" else "failed"] += 1
+                self._stats["queue_wait_seconds"] += job.started - job.created
+                self._stats["run_seconds"] += job.finished - job.started
+                for name, seconds in list(job.stages.items()):
+                    total = self._stage_totals.setdefault(name, [0, 0.0])
+                    total[0] += 1
+                    total[1] += seconds
+                self._finished.append(job.id)
+                self._purge()
+            self._queue.task_done()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            finished = stats["completed"] + stats["failed"]
+            wait, run = stats.pop("queue_wait_seconds"), stats.pop("run_seconds")
+            stats.update({
+                "workers": self.workers,
+                "running": self._running,
+                "queue_depth": self._queue.qsize(),
+                "max_queue": self.max_queue,
+                "jobs_kept": len(self._jobs),
+                "mean_queue_wait_ms": round(wait / finished * 1000, 2) if finished else 0.0,
+                "mean_run_ms": round(run / finished * 1000, 2) if finished else 0.0,
+                "mean_stage_ms": {name: round(total / count * 1000, 2)
+                                  for name, (count, total) in self._stage_totals.items()},
+            })
+        return stats
+
+
+# Shared queue used by /upload?async=1
+jobs = JobQueue()
+
+
+# --- Flask Integration ---
+def wants_async(request):
+    return request.values.get("async", "").lower() in ("1", "true", "yes")
+
+
+def accepted(job):
+    from flask import jsonify
+    return jsonify({"status": "queued", "job_id": job.id,
+                    "poll": f"/jobs/{job.id}", "events": f"/jobs/{job.id}/events"}), 202
+
+
+def busy():
+    from flask import jsonify
+    return (jsonify({"status": "error", "message": "Server busy, please retry shortly."}), 429,
+            {"Retry-After": str(RETRY_AFTER)})
+
+
+def status_response(job_id):
+    from flask import jsonify
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown or expired job"}), 404
+    return jsonify(job.to_dict())
+
+
+def _event_line(event):
+    return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+
+def _result_line(job):
+    return f"event: result\ndata: {json.dumps(job.to_dict())}\n\n"
+
+
+def event_lines(job):
+    # Replays every event so far, then follows the job until it finishes
+    cursor = 0
+    while True:
+        events = job.wait(cursor, KEEPALIVE)
+        if not events:
+            yield ": keepalive\n\n"
+            continue
+        for event in events:
+            yield _event_line(event)
+        cursor += len(events)
+        if job.done and cursor >= len(job.events):
+            yield _result_line(job)
+            return
+
+
+async def event_lines_async(job):
+    # event_lines() for asgi.py; an idle stream holds no thread
+    cursor = 0
+    while True:
+        events = await job.wait_async(cursor, KEEPALIVE)
+        if not events:
+            yield ": keepalive\n\n"
+            continue
+        for event in events:
+            yield _event_line(event)
+        cursor += len(events)
+        if job.done and cursor >= len(job.events):
+            yield _result_line(job)
+            return
+
+
+def events_response(job_id):
+    from flask import Response, jsonify
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown or expired job"}), 404
+    return Response(event_lines(job), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -1,37 +1,49 @@
 from flask import Flask, request, jsonify, render_template
 import datetime
 import re
-import json
-from sympy import symbols, Eq, solve, simplify, diff, integrate, limit, sympify
-import wikipedia
 import pytesseract
-from PIL import Image
 import pyttsx3
-import io
-import torch
-from transformers import BlipProcessor, BlipForConditionalGeneration
-from PyPDF2 import PdfReader
-import docx
 import random
+import model_registry
+import caption_batcher
+import vision_pipeline
+import analysis_cache
+import session_store
+import math_worker
+import safe_arith
+import intent_router
+import snippet_index
+import wiki_store
+import doc_extract
+import job_queue
+import reply_stream
+import request_metrics
+import inference_governor
+import doc_index
+import mask_codec
+import detection
 
 app = Flask(__name__)
 
 # --- Load Code Snippets from JSON ---
-with open('programs.json') as f:
-    code_snippets = json.load(f)
+# Indexed once (exact + typo-tolerant lookup) and reloaded when programs.json changes
+snippets = snippet_index.SnippetIndex('programs.json')
 
 # --- Memory for Wikipedia context ---
-last_wiki_topic = {"topic": None, "offset": 0}
-
-# --- Image Captioning Setup ---
-processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
-model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base")
-
-def get_image_caption(image: Image.Image) -> str:
-    inputs = processor(images=image, return_tensors="pt")
-    out = model.generate(**inputs)
-    caption = processor.decode(out[0], skip_special_tokens=True)
-    return caption
+# Kept per browser session (cookie) in the session store, not shared between users
+session_store.init_app(app)
+
+# --- Latency Metrics ---
+# GET /metrics (Prometheus text): route / intent / model histograms and these components' counters
+request_metrics.init_app(app, sources={
+    "cache": analysis_cache.cache.stats,
+    "caption": caption_batcher.batcher.metrics,
+    "math": math_worker.stats,
+    "wiki": wiki_store.store.stats,
+    "doc": doc_index.store.stats,
+    "job": job_queue.jobs.stats,
+    "inference": inference_governor.governor.stats,
+})
 
 # --- Story Generation --- 
 def generate_story(key_points):
@@ -73,94 +85,74 @@ def evaluate_math_expression(expression):
         expression = expression.replace("x", "*").replace("into", "*")
         expression = expression.replace("divided by", "/").replace("mod", "%")
         if re.match(r"^[\d\s\+\-\*/%\.\(\)]+$", expression):
-            result = eval(expression)
+            # AST evaluator with size limits instead of eval(), so "9**9**9" can't hang the worker
+            result = safe_arith.evaluate(expression)
             return f"The answer is: {result}"
         return None
+    except safe_arith.ArithmeticLimitError as e:
+        return safe_arith.limit_reply(e)
     except Exception:
         return None
 
 # --- Advanced Math Solver ---
+# SymPy runs in the math worker pool with a per-job timeout, never on the request thread
 def advanced_math_solver(expression):
-    try:
-        x = symbols('x')
-        expression = expression.lower().replace("^", "**")
-
-        if "solve" in expression:
-            eq = expression.replace("solve", "").strip()
-            lhs, rhs = eq.split("=")
-            equation = Eq(sympify(lhs), sympify(rhs))
-            result = solve(equation, x)
-            return f"Solution: {result}"
-        elif "differentiate" in expression or "derivative" in expression:
-            expr = expression.replace("differentiate", "").replace("derivative", "").strip()
-            return f"Derivative: {diff(sympify(expr))}"
-        elif "integrate" in expression:
-            expr = expression.replace("integrate", "").strip()
-            return f"Integral: {integrate(sympify(expr))}"
-        elif "simplify" in expression:
-            expr = expression.replace("simplify", "").strip()
-            return f"Simplified: {simplify(sympify(expr))}"
-        elif "limit" in expression:
-            expr = expression.replace("limit", "").strip()
-            return f"Limit as x approaches ∞: {limit(sympify(expr), x, float('inf'))}"
-        return None
-    except Exception:
-        return "Sorry, I couldn't solve that. Try checking your expression."
+    return math_worker.advanced_math_solver(expression)
 
 # --- Disease Info Handler ---
-def get_disease_info(message):
-    disease_data = {
-        "cold": {
-            "name": "Common Cold",
-            "symptoms": "Runny nose, sore throat, cough, congestion, slight body aches.",
-            "cause": "Caused by a viral infection (usually rhinovirus).",
-            "treatment": "Rest, hydration, and over-the-counter cold medications.",
-            "severity": "Mild"
-        },
-        "fever": {
-            "name": "Fever",
-            "symptoms": "High body temperature, chills, sweating, headache, body aches.",
-            "cause": "Usually due to an infection (bacterial or viral).",
-            "treatment": "Stay hydrated, take paracetamol or ibuprofen, and rest.",
-            "severity": "Mild to Moderate"
-        },
-        "covid": {
-            "name": "COVID-19",
-            "symptoms": "Fever, cough, fatigue, shortness of breath, loss of taste or smell.",
-            "cause": "Caused by SARS-CoV-2 virus, spreads through droplets.",
-            "treatment": "Isolation, monitoring symptoms, and seeking medical help if needed.",
-            "severity": "Varies from Mild to Severe"
-        },
-        "malaria": {
-            "name": "Malaria",
-            "symptoms": "Fever, chills, vomiting, headache, muscle pain.",
-            "cause": "Spread by Anopheles mosquitoes carrying Plasmodium parasite.",
-            "treatment": "Antimalarial medications prescribed by doctors.",
-            "severity": "Moderate to Severe"
-        },
-        "diabetes": {
-            "name": "Diabetes",
-            "symptoms": "Increased thirst, frequent urination, fatigue, blurred vision.",
-            "cause": "High blood sugar due to insulin issues (Type 1 or 2).",
-            "treatment": "Managed with medication, insulin, diet control, and exercise.",
-            "severity": "Chronic"
-        },
-        "hypertension": {
-            "name": "Hypertension",
-            "symptoms": "Often silent, may include headache, shortness of breath, or nosebleeds.",
-            "cause": "High pressure in the arteries. Risk factor for heart disease.",
-            "treatment": "Lifestyle changes and antihypertensive drugs.",
-            "severity": "Chronic"
-        },
-        "headache": {
-            "name": "Headache",
-            "symptoms": "Pain in head, scalp, or neck. Can be dull or sharp.",
-            "cause": "Stress, dehydration, sinus issues, eye strain, or more serious causes.",
-            "treatment": "Rest, hydration, and over-the-counter pain relievers.",
-            "severity": "Mild to Moderate"
-        }
+disease_data = {
+    "cold": {
+        "name": "Common Cold",
+        "symptoms": "Runny nose, sore throat, cough, congestion, slight body aches.",
+        "cause": "Caused by a viral infection (usually rhinovirus).",
+        "treatment": "Rest, hydration, and over-the-counter cold medications.",
+        "severity": "Mild"
+    },
+    "fever": {
+        "name": "Fever",
+        "symptoms": "High body temperature, chills, sweating, headache, body aches.",
+        "cause": "Usually due to an infection (bacterial or viral).",
+        "treatment": "Stay hydrated, take paracetamol or ibuprofen, and rest.",
+        "severity": "Mild to Moderate"
+    },
+    "covid": {
+        "name": "COVID-19",
+        "symptoms": "Fever, cough, fatigue, shortness of breath, loss of taste or smell.",
+        "cause": "Caused by SARS-CoV-2 virus, spreads through droplets.",
+        "treatment": "Isolation, monitoring symptoms, and seeking medical help if needed.",
+        "severity": "Varies from Mild to Severe"
+    },
+    "malaria": {
+        "name": "Malaria",
+        "symptoms": "Fever, chills, vomiting, headache, muscle pain.",
+        "cause": "Spread by Anopheles mosquitoes carrying Plasmodium parasite.",
+        "treatment": "Antimalarial medications prescribed by doctors.",
+        "severity": "Moderate to Severe"
+    },
+    "diabetes": {
+        "name": "Diabetes",
+        "symptoms": "Increased thirst, frequent urination, fatigue, blurred vision.",
+        "cause": "High blood sugar due to insulin issues (Type 1 or 2).",
+        "treatment": "Managed with medication, insulin, diet control, and exercise.",
+        "severity": "Chronic"
+    },
+    "hypertension": {
+        "name": "Hypertension",
+        "symptoms": "Often silent, may include headache, shortness of breath, or nosebleeds.",
+        "cause": "High pressure in the arteries. Risk factor for heart disease.",
+        "treatment": "Lifestyle changes and antihypertensive drugs.",
+        "severity": "Chronic"
+    },
+    "headache": {
+        "name": "Headache",
+        "symptoms": "Pain in head, scalp, or neck. Can be dull or sharp.",
+        "cause": "Stress, dehydration, sinus issues, eye strain, or more serious causes.",
+        "treatment": "Rest, hydration, and over-the-counter pain relievers.",
+        "severity": "Mild to Moderate"
     }
+}
 
+def get_disease_info(message):
     for keyword, info in disease_data.items():
         if keyword in message:
             return (
@@ -174,121 +166,105 @@ def get_disease_info(message):
 
 # --- Program Snippet Handler ---
 def get_program_snippet(message):
-    for key in code_snippets:
-        if key.lower() in message.lower():
-            return f"Here is the {key} program:\n```python\n{code_snippets[key]}\n```"
-    return None
+    found = snippets.lookup(message)
+    if found is None:
+        return None
+    key, code = found
+    return f"Here is the {key} program:\n```python\n{code}\n```"
 
 # --- Wikipedia Info ---
 def get_wikipedia_info(query, more=False):
     try:
+        state = session_store.load()
+        last_wiki_topic = state.setdefault("wiki", {"topic": None, "offset": 0})
         if not more:
             last_wiki_topic["topic"] = query
             last_wiki_topic["offset"] = 0
         else:
             query = last_wiki_topic["topic"]
             last_wiki_topic["offset"] += 2
+        session_store.save(state)
 
         if not query:
             return "Please ask about a topic first."
 
-        summary = wikipedia.summary(query, sentences=last_wiki_topic["offset"] + 2)
-        paragraphs = summary.split(". ")
+        # Fetched once per topic; follow-ups page through the cached sentences
+        sentences = wiki_store.store.sentences(query)
         start = last_wiki_topic["offset"]
         end = start + 2
-        more_info = ". ".join(paragraphs[start:end])
+        more_info = " ".join(sentences[start:end])
         return more_info if more_info else "No more information available."
     except Exception:
         return "Sorry, I couldn't find information on that topic."
 
+# --- Wikipedia Intent Handlers ---
+def wikipedia_query(message):
+    return message.replace("about", "").replace("who is", "").replace("what is", "").strip()
+
+def wikipedia_topic(message, match):
+    return get_wikipedia_info(wikipedia_query(message), more=False)
+
+def wikipedia_more(message, match):
+    return get_wikipedia_info("", more=True)
+
+# --- Story Intent Handler ---
+def tell_story(message, match):
+    key_points = {"character": "young prince", "setting": "magical forest", "conflict": "an evil dragon", "resolution": "outsmarting the dragon using clever tricks"}
+    story = generate_story(key_points)
+    return story
+
+# --- Intent Table ---
+# Highest priority first. Compiled once into a single matcher; intents without
+# patterns (program snippets, basic math) are tried in their slot for every message.
+INTENTS = [
+    {"name": "name", "contains": ["what is your name"], "handler": intent_router.reply("My name is Virtual Assistant")},
+    # Only questions about an upload; without one the message goes on to the other intents
+    {"name": "document", "contains": ["my document", "my file", "my pdf", "uploaded document", "uploaded file",
+                                      "uploaded pdf", "document say", "file say", "pdf say", "document mention"],
+     "handler": lambda message, match: doc_index.answer(message)},
+    {"name": "greeting", "contains": ["hello", "hye", "hay", "hi"], "handler": intent_router.reply("Hey sir, how can I help you!")},
+    {"name": "how_are_you", "contains": ["how are you"], "handler": intent_router.reply("I am doing great these days, sir.")},
+    {"name": "thanks", "contains": ["thanku", "thank"], "handler": intent_router.reply("It's my pleasure, sir, to stay with you.")},
+    {"name": "good_morning", "contains": ["good morning"], "handler": intent_router.reply("Good morning sir, I think you might need some help.")},
+    {"name": "time", "contains": ["time now"], "handler": lambda message, match: datetime.datetime.now().strftime("Current time is %I:%M %p")},
+    {"name": "current_affairs", "contains": ["current affairs"], "handler": intent_router.reply(
+        "📰 Here are some current affairs (April 7, 2025):\n"
+        "- India and Japan sign defense cooperation pact.\n"
+        "- ISRO announces launch of Chandrayaan-4 in December.\n"
+        "- Stock markets see record high this week.\n"
+        "- NASA confirms water traces on Europa.\n"
+        "- T20 World Cup preparations begin across nations."
+    )},
+    {"name": "open_youtube", "contains": ["open youtube"], "handler": intent_router.reply("OPEN_YOUTUBE")},
+    {"name": "open_google", "contains": ["open google"], "handler": intent_router.reply("OPEN_GOOGLE")},
+    {"name": "open_facebook", "contains": ["open facebook"], "handler": intent_router.reply("OPEN_FACEBOOK")},
+    {"name": "open_sbtet", "contains": ["open sbtet"], "handler": intent_router.reply("OPEN_SBTET")},
+    {"name": "open_music", "contains": ["open music"], "handler": intent_router.reply("OPEN_MUSIC")},
+    {"name": "shutdown", "contains": ["shutdown", "quit"], "handler": intent_router.reply("Ok sir. Shutting down.")},
+    {"name": "wikipedia", "prefix": ["about ", "who is ", "what is "], "handler": wikipedia_topic},
+    {"name": "wikipedia_more", "contains": ["more about him", "more about her"], "handler": wikipedia_more},
+    {"name": "program", "handler": lambda message, match: get_program_snippet(message)},
+    {"name": "basic_math", "handler": lambda message, match: evaluate_math_expression(message)},
+    {"name": "advanced_math", "contains": list(math_worker.MATH_KEYWORDS),
+     "handler": lambda message, match: advanced_math_solver(message)},
+    {"name": "disease", "contains": list(disease_data), "handler": lambda message, match: get_disease_info(message)},
+    {"name": "story", "contains": ["tell me a story"], "handler": tell_story},
+]
+
+router = intent_router.IntentRouter(INTENTS)
+
 # --- Assistant Logic ---
 def assistant_logic(send):
     data_btn = send.lower()
-
-    if "what is your name" in data_btn:
-        return "My name is Virtual Assistant"
-    elif any(greet in data_btn for greet in ["hello", "hye", "hay", "hi"]):
-        return "Hey sir, how can I help you!"
-    elif "how are you" in data_btn:
-        return "I am doing great these days, sir."
-    elif "thanku" in data_btn or "thank" in data_btn:
-        return "It's my pleasure, sir, to stay with you."
-    elif "good morning" in data_btn:
-        return "Good morning sir, I think you might need some help."
-    elif "time now" in data_btn:
-        now = datetime.datetime.now()
-        return now.strftime("Current time is %I:%M %p")
-    elif "current affairs" in data_btn:
-        return (
-            "📰 Here are some current affairs (April 7, 2025):\n"
-            "- India and Japan sign defense cooperation pact.\n"
-            "- ISRO announces launch of Chandrayaan-4 in December.\n"
-            "- Stock markets see record high this week.\n"
-            "- NASA confirms water traces on Europa.\n"
-            "- T20 World Cup preparations begin across nations."
-        )
-    elif "open youtube" in data_btn:
-        return "OPEN_YOUTUBE"
-    elif "open google" in data_btn:
-        return "OPEN_GOOGLE"
-    elif "open facebook" in data_btn:
-        return "OPEN_FACEBOOK"
-    elif "open sbtet" in data_btn:
-        return "OPEN_SBTET"
-    elif "open music" in data_btn:
-        return "OPEN_MUSIC"
-    elif "shutdown" in data_btn or "quit" in data_btn:
-        return "Ok sir. Shutting down."
-
-    if data_btn.startswith(("about ", "who is ", "what is ")):
-        topic = data_btn.replace("about", "").replace("who is", "").replace("what is", "").strip()
-        return get_wikipedia_info(topic, more=False)
-    elif "more about him" in data_btn or "more about her" in data_btn:
-        return get_wikipedia_info("", more=True)
-
-    program_result = get_program_snippet(data_btn)
-    if program_result:
-        return program_result
-
-    basic_result = evaluate_math_expression(data_btn)
-    if basic_result:
-        return basic_result
-
-    advanced_result = advanced_math_solver(data_btn)
-    if advanced_result:
-        return advanced_result
-
-    disease_result = get_disease_info(data_btn)
-    if disease_result:
-        return disease_result
-
-    # Check if the user wants a story and call the story generator
-    if "tell me a story" in data_btn:
-        key_points = {"character": "young prince", "setting": "magical forest", "conflict": "an evil dragon", "resolution": "outsmarting the dragon using clever tricks"}
-        story = generate_story(key_points)
-        return story
-
-    return "Sorry, I didn’t understand that. Try asking about diseases, math problems, or say 'open YouTube' or upload a file or image."
-
-# --- File Reading Functions ---
-def read_pdf_file(file):
-    reader = PdfReader(file)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text()
-    return text
-
-def read_docx_file(file):
-    doc = docx.Document(file)
-    text = ""
-    for para in doc.paragraphs:
-        text += para.text + "\n"
-    return text
-
-def read_txt_file(file):
-    return file.read().decode("utf-8")
+    return router.dispatch(
+        data_btn,
+        default="Sorry, I didn’t understand that. Try asking about diseases, math problems, or say 'open YouTube' or upload a file or image.",
+    )
 
 # --- Image Recognition and Captioning ---
+# Run on an image upload unless ?analyses= says otherwise (also used by asgi.py)
+UPLOAD_ANALYSES = ("caption",)
+
 @app.route('/upload', methods=['POST'])
 def upload():
     file = request.files.get('file') or request.files.get('image')
@@ -297,30 +273,39 @@ def upload():
         try:
             # Handling image captioning
             if filename.endswith(('.png', '.jpg', '.jpeg', '.bmp')): 
-                img = Image.open(io.BytesIO(file.read()))
-                caption = get_image_caption(img)
-
-                # Weapon detection logic - Check for weapon-related keywords in caption
-                weapons = ["gun", "knife", "pistol", "bomb", "rifle"]
-                detected_weapons = [weapon for weapon in weapons if weapon in caption.lower()]
-
-                if detected_weapons:
-                    # Add a warning to the caption if a weapon is detected
-                    warning_message = f"⚠️ Warning: Possible weapon detected ({', '.join(detected_weapons)})."
-                    caption = warning_message + "\n" + caption
-
-                return jsonify({"caption": caption})
+                # Decode once and run the requested analyses (?analyses=caption,detect,segment)
+                analyses = vision_pipeline.parse_analyses(request.values.get("analyses"), default=UPLOAD_ANALYSES)
+                # ?mask_format=png|palette|rle|polygons picks how the segmentation mask is encoded
+                mask_format = mask_codec.parse_format(request.values.get("mask_format"))
+                # ?score=, ?max_detections=, ?classes=person,dog narrow the detections
+                detect_options = detection.parse_options(request.values)
+                # ?async=1 queues the work and answers 202 with a job id to poll
+                if job_queue.wants_async(request):
+                    try:
+                        job = job_queue.jobs.submit(vision_pipeline.run_job, file.read(), analyses,
+                                                     mask_format=mask_format, detect_options=detect_options)
+                    except job_queue.QueueFull:
+                        return job_queue.busy()
+                    return job_queue.accepted(job)
+                # ?stream=1 sends the caption token by token (server-sent events), then the full result
+                if reply_stream.wants_stream(request):
+                    return reply_stream.upload_response(file.read(), analyses, mask_format=mask_format,
+                                                        detect_options=detect_options)
+                img = vision_pipeline.decode_image(file.read())
+                result = vision_pipeline.analyze(img, analyses, detect_options=detect_options)
+                response = vision_pipeline.build_response(result, mask_format=mask_format)
+
+                return jsonify(response)
 
             # Handling text files (PDF, DOCX, TXT)
-            elif filename.endswith('.pdf'):
-                content = read_pdf_file(file)
-                return jsonify({"type": "text", "result": content})
-            elif filename.endswith('.docx'):
-                content = read_docx_file(file)
-                return jsonify({"type": "text", "result": content})
-            elif filename.endswith('.txt'):
-                content = read_txt_file(file)
-                return jsonify({"type": "text", "result": content})
+            # ?stream=1 sends NDJSON page / paragraph chunks instead of one JSON body
+            elif filename.endswith(doc_extract.EXTENSIONS) and doc_extract.wants_stream(request):
+                return doc_extract.stream_response(file, file.filename, ingest=doc_index.open_document)
+            elif filename.endswith(doc_extract.EXTENSIONS):
+                # Also indexed for this session so chat can answer questions about it
+                pieces = list(doc_extract.iter_document(file, filename))
+                doc_index.add_document(file.filename, pieces)
+                return jsonify({"type": "text", "result": "".join(text for _, _, text in pieces)})
             else:
                 return jsonify({"status": "error", "message": "Unsupported file type"})
         
@@ -329,14 +314,75 @@ def upload():
     
     return jsonify({"status": "no file uploaded"})
 
+@app.route('/upload/mask', methods=['POST'])
+def upload_mask():
+    # Segmentation mask only, without JSON: ?format=raw (uint8 class ids, default), png or palette
+    file = request.files.get('file') or request.files.get('image')
+    if not file:
+        return jsonify({"status": "no file uploaded"})
+    try:
+        mask_format = mask_codec.parse_format(request.values.get("format"), default="raw", formats=mask_codec.BINARY_FORMATS)
+        img = vision_pipeline.decode_image(file.read())
+        result = vision_pipeline.analyze(img, ("segment",))
+        if vision_pipeline.screened_out(result):
+            # OMNIBOT_WEAPON_SHORT_CIRCUIT: flagged images get the screening verdict instead of a mask
+            return jsonify(dict(vision_pipeline.build_response(result), status="error",
+                                message="Image flagged by weapon screening; no mask was computed.")), 422
+        return mask_codec.binary_response(result["segmentation"], mask_format)
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)})
+
 # --- Routes ---
 @app.route("/")
 def index():
     return render_template("index.html")
 
+@app.route("/models")
+def models_status():
+    return jsonify(model_registry.stats())
+
+@app.route("/caption-metrics")
+def caption_metrics():
+    return jsonify(caption_batcher.batcher.metrics())
+
+@app.route("/cache-metrics")
+def cache_metrics():
+    return jsonify(analysis_cache.cache.stats())
+
+@app.route("/math-metrics")
+def math_metrics():
+    return jsonify(math_worker.stats())
+
+@app.route("/wiki-metrics")
+def wiki_metrics():
+    return jsonify(wiki_store.store.stats())
+
+@app.route("/doc-metrics")
+def doc_metrics():
+    return jsonify(doc_index.store.stats())
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    return job_queue.status_response(job_id)
+
+@app.route("/jobs/<job_id>/events")
+def job_events(job_id):
+    return job_queue.events_response(job_id)
+
+@app.route("/job-metrics")
+def job_metrics():
+    return jsonify(job_queue.jobs.stats())
+
+@app.route("/inference-metrics")
+def inference_metrics():
+    return jsonify(inference_governor.governor.stats())
+
 @app.route("/chat", methods=["POST"])
 def chat():
     user_message = request.json.get("message", "")
+    # ?stream=1 answers with a start event at once and the reply when it is ready
+    if reply_stream.wants_stream(request):
+        return reply_stream.chat_response(assistant_logic, user_message)
     reply = assistant_logic(user_message)
     return jsonify({"reply": reply})
 
@@ -0,0 +1,216 @@
+import argparse
+import base64
+import io
+import json
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+# --- Segmentation Mask Encoding ---
+# The DeepLabV3 mask (one class id per pixel) can be returned in several forms,
+# chosen per request with ?mask_format=:
+#
+#   png       grayscale PNG as a base64 data URI (default, what the UI shows)
+#   palette   the same PNG with the VOC colour palette, easier to look at
+#   rle       COCO run-length encoding per class (pycocotools-compatible)
+#   polygons  per-class outlines as COCO polygons (needs opencv-python)
+#
+# POST /upload/mask returns the mask as raw bytes (or PNG) without JSON.
+# Size and encode-time comparison: python mask_codec.py --size 512
+
+FORMATS = ("png", "palette", "rle", "polygons")
+BINARY_FORMATS = ("raw", "png", "palette")
+
+VOC_CLASSES = [
+    "background", "aeroplane", "bicycle", "bird", "boat", "bottle", "bus", "car", "cat", "chair", "cow",
+    "diningtable", "dog", "horse", "motorbike", "person", "pottedplant", "sheep", "sofa", "train", "tvmonitor",
+]
+
+
+def parse_format(value, default="png", formats=FORMATS):
+    if not value:
+        return default
+    value = value.strip().lower()
+    if value not in formats:
+        raise ValueError(f"Unknown mask format: {value}")
+    return value
+
+
+def _voc_palette():
+    # Standard PASCAL VOC colour map, 256 entries
+    palette = []
+    for index in range(256):
+        r = g = b = 0
+        c = index
+        for shift in range(7, -1, -1):
+            r |= (c & 1) << shift
+            g |= ((c >> 1) & 1) << shift
+            b |= ((c >> 2) & 1) << shift
+            c >>= 3
+        palette += [r, g, b]
+    return palette
+
+
+VOC_PALETTE = _voc_palette()
+
+
+def class_name(class_id):
+    return VOC_CLASSES[class_id] if class_id < len(VOC_CLASSES) else str(class_id)
+
+
+# --- Encoders ---
+def png_bytes(mask: Image.Image, palette=False):
+    if palette:
+        mask = mask.convert("L").convert("P")
+        mask.putpalette(VOC_PALETTE)
+    buffered = io.BytesIO()
+    mask.save(buffered, format="PNG", optimize=False)
+    return buffered.getvalue()
+
+
+def _rle_counts(binary):
+    # Run lengths over the column-major flattening, starting with a run of zeros
+    flat = binary.ravel(order="F")
+    changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    counts = np.diff(np.concatenate(([0], changes, [flat.size])))
+    if flat[0]:
+        counts = np.concatenate(([0], counts))
+    return counts.tolist()
+
+
+def _rle_string(counts):
+    # pycocotools' compressed counts string (5-bit groups, delta against counts[i - 2])
+    chars = []
+    for i, x in enumerate(counts):
+        if i > 2:
+            x -= counts[i - 2]
+        more = True
+        while more:
+            c = x & 0x1f
+            x >>= 5
+            more = x != -1 if c & 0x10 else x != 0
+            if more:
+                c |= 0x20
+            chars.append(chr(c + 48))
+    return "".join(chars)
+
+
+def encode_rle(mask: Image.Image):
+    array = np.asarray(mask)
+    height, width = array.shape
+    segments = []
+    for class_id in np.unique(array).tolist():
+        if class_id == 0:
+            continue  # background is everything else
+        binary = array == class_id
+        segments.append({
+            "class_id": class_id,
+            "label": class_name(class_id),
+            "area": int(binary.sum()),
+            "rle": {"size": [height, width], "counts": _rle_string(_rle_counts(binary))},
+        })
+    return {"format": "rle", "size": [height, width], "segments": segments}
+
+
+def encode_polygons(mask: Image.Image, tolerance=1.0):
+    try:
+        import cv2
+    except ImportError:
+        raise RuntimeError("mask_format=polygons needs OpenCV (pip install opencv-python-headless)")
+    array = np.asarray(mask)
+    height, width = array.shape
+    segments = []
+    for class_id in np.unique(array).tolist():
+        if class_id == 0:
+            continue
+        binary = (array == class_id).astype(np.uint8)
+        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        polygons = []
+        for contour in contours:
+            contour = cv2.approxPolyDP(contour, tolerance, True)
+            if len(contour) >= 3:
+                polygons.append(contour.reshape(-1).tolist())  # [x0, y0, x1, y1, ...]
+        if polygons:
+            segments.append({"class_id": class_id, "label": class_name(class_id),
+                             "area": int(binary.sum()), "polygons": polygons})
+    return {"format": "polygons", "size": [height, width], "segments": segments}
+
+
+def encode(mask: Image.Image, mask_format="png"):
+    # Value for the "segmentation" key of the /upload response
+    if mask_format == "rle":
+        return encode_rle(mask)
+    if mask_format == "polygons":
+        return encode_polygons(mask)
+    data = base64.b64encode(png_bytes(mask, palette=mask_format == "palette")).decode("utf-8")
+    return f"data:image/png;base64,{data}"
+
+
+# --- Flask Integration ---
+def binary_response(mask: Image.Image, mask_format="raw"):
+    # Raw: one uint8 class id per pixel, row-major; the shape is in the headers
+    from flask import Response
+    headers = {"X-Mask-Width": str(mask.width), "X-Mask-Height": str(mask.height)}
+    if mask_format == "raw":
+        return Response(mask.tobytes(), mimetype="application/octet-stream", headers=headers)
+    return Response(png_bytes(mask, palette=mask_format == "palette"), mimetype="image/png", headers=headers)
+
+
+# --- Benchmark ---
+def synthetic_mask(size=512, seed=5):
+    # A few overlapping blobs of VOC classes, roughly like a real scene
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:size, 0:size]
+    array = np.zeros((size, size), dtype=np.uint8)
+    for class_id in rng.choice(np.arange(1, 21), size=6, replace=False):
+        cx, cy = rng.integers(0, size, 2)
+        rx, ry = rng.integers(size // 10, size // 3, 2)
+        array[((xx - cx) / rx) ** 2 + ((yy - cy) / ry) ** 2 <= 1] = class_id
+    return Image.fromarray(array)
+
+
+def benchmark(mask: Image.Image, rounds=20):
+    report = []
+    for name in ("raw", "png", "palette", "rle", "polygons"):
+        try:
+            start = time.perf_counter()
+            for _ in range(rounds):
+                if name == "raw":
+                    body = mask.tobytes()
+                elif name in ("png", "palette"):
+                    body = png_bytes(mask, palette=name == "palette")
+                else:
+                    body = json.dumps(encode(mask, name)).encode()
+            seconds = (time.perf_counter() - start) / rounds
+        except RuntimeError as e:
+            report.append({"format": name, "skipped": str(e)})
+            continue
+        row = {"format": name, "bytes": len(body), "encode_ms": round(seconds * 1000, 2)}
+        if name in ("png", "palette"):
+            row["json_bytes"] = len(json.dumps(encode(mask, name)))  # base64 data URI in JSON
+        report.append(row)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare segmentation mask encodings")
+    parser.add_argument("--size", type=int, default=512, help="Side of the synthetic mask")
+    parser.add_argument("--mask", help="Use a grayscale class-id PNG instead of a synthetic mask")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    mask = Image.open(args.mask).convert("L") if args.mask else synthetic_mask(args.size)
+    print(f"mask {mask.width}x{mask.height}")
+    print(f"{'format':<10}{'bytes':>10}{'in JSON':>10}{'encode ms':>11}")
+    for row in benchmark(mask, args.rounds):
+        if "skipped" in row:
+            print(f"{row['format']:<10}  skipped: {row['skipped']}")
+        else:
+            print(f"{row['format']:<10}{row['bytes']:>10}{row.get('json_bytes', ''):>10}{row['encode_ms']:>11}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
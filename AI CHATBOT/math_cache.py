@@ -0,0 +1,124 @@
+import atexit
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# --- Symbolic Results Cache ---
+# Results are stored under a canonical key built by the math workers from the
+# parsed SymPy expression ("solve|<srepr>"), so "x^2 + 2x - 3 = 0" and
+# "2*x + x**2 = 3" share one entry. The raw message text is kept as an alias
+# of its canonical key so exact repeats skip parsing entirely.
+
+MAX_ITEMS = int(os.environ.get("OMNIBOT_MATH_CACHE_ITEMS", "1024"))
+CACHE_FILE = os.environ.get("OMNIBOT_MATH_CACHE_FILE", "")
+SAVE_INTERVAL = 30.0  # seconds between writes of the persistence file
+
+
+def normalize_text(expression):
+    return " ".join(expression.lower().replace("**", "^").split())
+
+
+class SymbolicCache:
+    def __init__(self, max_items=MAX_ITEMS, path=CACHE_FILE):
+        self.max_items = max_items
+        self.path = path
+        self._results = OrderedDict()
+        self._aliases = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._stats = {"hits": 0, "alias_hits": 0, "misses": 0}
+        if self.path:
+            self.load()
+            atexit.register(self.save)
+
+    def get(self, text):
+        # Lookup by raw text; returns the cached reply or None
+        with self._lock:
+            key = self._aliases.get(normalize_text(text))
+            if key is None or key not in self._results:
+                return None
+            self._aliases.move_to_end(normalize_text(text))
+            self._results.move_to_end(key)
+            self._stats["alias_hits"] += 1
+            return self._results[key]
+
+    def get_canonical(self, key, text=None):
+        with self._lock:
+            if key not in self._results:
+                self._stats["misses"] += 1
+                return None
+            self._results.move_to_end(key)
+            self._stats["hits"] += 1
+            if text is not None:
+                self._remember(self._aliases, normalize_text(text), key)
+            return self._results[key]
+
+    def put(self, key, result, text=None):
+        with self._lock:
+            self._remember(self._results, key, result)
+            if text is not None:
+                self._remember(self._aliases, normalize_text(text), key)
+            self._dirty = True
+            due = self.path and time.monotonic() - self._saved_at > SAVE_INTERVAL
+        if due:
+            self.save()
+
+    def _remember(self, table, key, value):
+        table[key] = value
+        table.move_to_end(key)
+        # Aliases may outnumber results a little; both are bounded the same way
+        while len(table) > self.max_items:
+            table.popitem(last=False)
+
+    # --- Persistence ---
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            for key, result in data.get("results", {}).items():
+                self._remember(self._results, key, result)
+            for text, key in data.get("aliases", {}).items():
+                self._remember(self._aliases, text, key)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"results": dict(self._results), "aliases": dict(self._aliases)}
+            self._dirty = False
+            self._saved_at = time.monotonic()
+        # A unique temp file per save, so workers sharing the path never write into each other's
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)),
+                                            prefix=os.path.basename(self.path) + ".", suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if tmp_path is not None:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_path)
+            with self._lock:
+                self._dirty = True
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["items"] = len(self._results)
+            stats["aliases"] = len(self._aliases)
+        return stats
+
+
+# Shared cache used by the math solver
+cache = SymbolicCache()
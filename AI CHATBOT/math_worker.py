@@ -0,0 +1,295 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+import math_cache
+
+# --- Sandboxed Math Worker Pool ---
+# SymPy solve/integrate/limit can run for minutes on a pathological input, so
+# it never runs on the request thread. Jobs go to a small pool of worker
+# processes; a job that overruns its timeout has its process killed and
+# replaced, and callers get a clean "took too long" reply instead. Results are
+# memoised in math_cache under a canonical form of the parsed expression.
+
+WORKERS = int(os.environ.get("OMNIBOT_MATH_WORKERS", "2"))
+TIMEOUT = float(os.environ.get("OMNIBOT_MATH_TIMEOUT", "5"))
+MAX_QUEUE = int(os.environ.get("OMNIBOT_MATH_MAX_QUEUE", "16"))
+STARTUP_TIMEOUT = 30.0
+
+MATH_KEYWORDS = ("solve", "differentiate", "derivative", "integrate", "simplify", "limit")
+
+ERROR_REPLY = "Sorry, I couldn't solve that. Try checking your expression."
+TIMEOUT_REPLY = "Sorry, that took too long to solve. Try a simpler expression."
+BUSY_REPLY = "The math solver is busy right now. Please try again in a moment."
+
+
+def is_math_query(expression):
+    expression = expression.lower()
+    return any(keyword in expression for keyword in MATH_KEYWORDS)
+
+
+# --- Advanced Math Solver ---
+# Runs inside the worker processes
+def parse_query(expression):
+    # (operation, parsed SymPy expression) or None if this isn't a math query
+    from sympy import Eq, sympify
+    expression = expression.lower().replace("^", "**")
+
+    if "solve" in expression:
+        eq = expression.replace("solve", "").strip()
+        lhs, rhs = eq.split("=")
+        return "solve", Eq(sympify(lhs), sympify(rhs))
+    elif "differentiate" in expression or "derivative" in expression:
+        expr = expression.replace("differentiate", "").replace("derivative", "").strip()
+        return "diff", sympify(expr)
+    elif "integrate" in expression:
+        expr = expression.replace("integrate", "").strip()
+        return "integrate", sympify(expr)
+    elif "simplify" in expression:
+        expr = expression.replace("simplify", "").strip()
+        return "simplify", sympify(expr)
+    elif "limit" in expression:
+        expr = expression.replace("limit", "").strip()
+        return "limit", sympify(expr)
+    return None
+
+
+def canonical_key(expression):
+    # SymPy orders Add/Mul arguments when parsing, so spacing and term-order
+    # variants of the same query produce the same srepr
+    from sympy import Eq, srepr
+    try:
+        query = parse_query(expression)
+    except Exception:
+        return None
+    if query is None:
+        return None
+    operation, expr = query
+    if operation == "solve" and isinstance(expr, Eq):
+        expr = expr.lhs - expr.rhs  # "x^2 = 3 - 2x" and "x^2 + 2x - 3 = 0" are the same equation
+    return f"{operation}|{srepr(expr)}"
+
+
+def solve_expression(expression):
+    from sympy import symbols, solve, simplify, diff, integrate, limit
+    try:
+        query = parse_query(expression)
+        if query is None:
+            return None
+        operation, expr = query
+        x = symbols('x')
+
+        if operation == "solve":
+            return f"Solution: {solve(expr, x)}"
+        elif operation == "diff":
+            return f"Derivative: {diff(expr)}"
+        elif operation == "integrate":
+            return f"Integral: {integrate(expr)}"
+        elif operation == "simplify":
+            return f"Simplified: {simplify(expr)}"
+        return f"Limit as x approaches ∞: {limit(expr, x, float('inf'))}"
+    except Exception:
+        return ERROR_REPLY
+
+
+JOBS = {"solve": solve_expression, "canonical": canonical_key}
+
+
+class SolverBusy(Exception):
+    pass
+
+
+class SolverTimeout(Exception):
+    pass
+
+
+class SolverCrashed(Exception):
+    pass
+
+
+def _process_context():
+    # A fork would copy the server's loaded models, torch thread pools and
+    # in-flight request threads into the solver; forkserver starts clean children
+    # from a small helper process, spawn from a fresh interpreter
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _worker_main(conn):
+    import sympy  # noqa: F401 - pay the import before reporting ready
+    conn.send("ready")
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        kind, expression = job
+        conn.send(JOBS[kind](expression))
+
+
+class MathWorkerPool:
+    def __init__(self, workers=WORKERS, timeout=TIMEOUT, max_queue=MAX_QUEUE):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.max_queue = max_queue
+        self._ctx = _process_context()
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._lock = threading.Lock()
+        self._all = set()
+        self._pending = 0
+        self._stats = {"completed": 0, "timeouts": 0, "rejected": 0, "crashed": 0, "restarts": 0}
+
+    def _spawn(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(target=_worker_main, args=(child_conn,), name="math-worker", daemon=True)
+        process.start()
+        child_conn.close()
+        if not parent_conn.poll(STARTUP_TIMEOUT) or parent_conn.recv() != "ready":
+            self._kill((process, parent_conn))
+            raise RuntimeError("Math worker failed to start")
+        worker = (process, parent_conn)
+        with self._lock:
+            self._all.add(worker)
+        return worker
+
+    def _kill(self, worker):
+        process, conn = worker
+        process.terminate()
+        process.join(1)
+        if process.is_alive():
+            process.kill()
+        conn.close()
+        with self._lock:
+            self._all.discard(worker)
+
+    def _checkout(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return self._spawn()
+            if worker[0].is_alive():
+                return worker
+            self._kill(worker)
+
+    def warm(self):
+        # Start every worker up front so the first requests don't pay for process start
+        workers = [self._checkout() for _ in range(self.workers - self._idle.qsize())]
+        for worker in workers:
+            self._idle.put(worker)
+
+    def call(self, kind, expression, timeout=None):
+        # Raises SolverBusy / SolverTimeout / SolverCrashed instead of returning a reply
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            if self._pending >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise SolverBusy()
+            self._pending += 1
+
+        deadline = time.monotonic() + timeout
+        try:
+            if not self._slots.acquire(timeout=timeout):
+                self._count("timeouts")
+                raise SolverTimeout()
+            try:
+                return self._run_on_worker((kind, expression), deadline)
+            finally:
+                self._slots.release()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def run(self, expression, timeout=None):
+        try:
+            return self.call("solve", expression, timeout)
+        except SolverBusy:
+            return BUSY_REPLY
+        except SolverTimeout:
+            return TIMEOUT_REPLY
+        except SolverCrashed:
+            return ERROR_REPLY
+
+    def _run_on_worker(self, job, deadline):
+        worker = self._checkout()
+        _, conn = worker
+        try:
+            conn.send(job)
+            if conn.poll(max(0.0, deadline - time.monotonic())):
+                result = conn.recv()
+                self._idle.put(worker)
+                self._count("completed")
+                return result
+        except (EOFError, OSError):
+            self._kill(worker)
+            self._count("crashed")
+            raise SolverCrashed()
+
+        # Took too long: kill the process so it stops burning a core
+        self._kill(worker)
+        self._count("timeouts")
+        self._count("restarts")
+        raise SolverTimeout()
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def shutdown(self):
+        # Cancels in-flight jobs too: their workers are killed and callers get an error reply
+        with self._lock:
+            workers = list(self._all)
+        for worker in workers:
+            self._kill(worker)
+        while not self._idle.empty():
+            self._idle.get_nowait()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["queued"] = self._pending
+            stats["live_workers"] = len(self._all)
+        stats.update(workers=self.workers, timeout=self.timeout, max_queue=self.max_queue)
+        return stats
+
+
+# Shared pool used by every app in the process
+pool = MathWorkerPool()
+
+
+def advanced_math_solver(expression):
+    if not is_math_query(expression):
+        return None
+
+    # Exact repeat of an earlier message: no worker round-trip at all
+    cached = math_cache.cache.get(expression)
+    if cached is not None:
+        return cached
+
+    deadline = time.monotonic() + pool.timeout
+    try:
+        key = pool.call("canonical", expression)
+        if key is not None:
+            cached = math_cache.cache.get_canonical(key, text=expression)
+            if cached is not None:
+                return cached
+        result = pool.call("solve", expression, timeout=max(0.0, deadline - time.monotonic()))
+    except SolverBusy:
+        return BUSY_REPLY
+    except SolverTimeout:
+        return TIMEOUT_REPLY
+    except SolverCrashed:
+        return ERROR_REPLY
+
+    if key is not None and result not in (None, ERROR_REPLY):
+        math_cache.cache.put(key, result, text=expression)
+    return result
+
+
+def stats():
+    return dict(pool.stats(), cache=math_cache.cache.stats())
@@ -0,0 +1,186 @@
+import gc
+import os
+import threading
+import time
+
+import detection
+import inference_backends
+
+# --- Model Registry ---
+# Heavy models are loaded the first time a request needs them and then shared
+# by every request in the process. Text-only workers never touch torch at all.
+
+# Seconds a model may sit unused before it is unloaded (0 = keep forever)
+MODEL_IDLE_TTL = float(os.environ.get("OMNIBOT_MODEL_IDLE_TTL", "0"))
+REAPER_INTERVAL = float(os.environ.get("OMNIBOT_MODEL_REAPER_INTERVAL", "60"))
+
+_loaders = {}
+_load_locks = {}
+_models = {}
+_stats = {}
+_reaper = None
+_reaper_lock = threading.Lock()
+
+
+def names():
+    return list(_loaders)
+
+
+def register(name, loader):
+    _loaders[name] = loader
+    _load_locks[name] = threading.Lock()
+    _stats.setdefault(name, {"loaded": False, "backend": None, "loads": 0, "load_seconds": None,
+                             "size_mb": None, "last_used": None})
+
+
+def _resident_bytes(value):
+    # Sum parameter and buffer storage of every torch module in the loaded value
+    items = value if isinstance(value, (tuple, list)) else (value,)
+    total = 0
+    for item in items:
+        if hasattr(item, "parameters") and hasattr(item, "buffers"):
+            for tensor in list(item.parameters()) + list(item.buffers()):
+                total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def get(name):
+    if name not in _loaders:
+        raise KeyError(f"Unknown model: {name}")
+
+    value = _models.get(name)
+    if value is None:
+        value = _load(name)
+        _ensure_reaper()
+
+    _stats[name]["last_used"] = time.time()
+    return value
+
+
+def _load(name):
+    with _load_locks[name]:
+        value = _models.get(name)
+        if value is None:
+            start = time.perf_counter()
+            value = _loaders[name]()
+            elapsed = time.perf_counter() - start
+            _models[name] = value
+            stats = _stats[name]
+            stats["loaded"] = True
+            stats["backend"] = inference_backends.backend_for(name)
+            stats["loads"] += 1
+            stats["load_seconds"] = round(elapsed, 3)
+            stats["size_mb"] = round(_resident_bytes(value) / (1024 * 1024), 1)
+    return value
+
+
+def is_loaded(name):
+    return name in _models
+
+
+def unload(name):
+    with _load_locks[name]:
+        if _models.pop(name, None) is None:
+            return False
+        _stats[name]["loaded"] = False
+    gc.collect()
+    return True
+
+
+def unload_idle(ttl=None):
+    ttl = MODEL_IDLE_TTL if ttl is None else ttl
+    if ttl <= 0:
+        return []
+    now = time.time()
+    unloaded = []
+    for name in list(_models):
+        last_used = _stats[name]["last_used"] or 0
+        if now - last_used > ttl and unload(name):
+            unloaded.append(name)
+    return unloaded
+
+
+def _reap_forever():
+    while True:
+        time.sleep(REAPER_INTERVAL)
+        unload_idle()
+
+
+def _ensure_reaper():
+    global _reaper
+    if MODEL_IDLE_TTL <= 0 or _reaper is not None:
+        return
+    with _reaper_lock:
+        if _reaper is None:
+            _reaper = threading.Thread(target=_reap_forever, name="model-reaper", daemon=True)
+            _reaper.start()
+
+
+# --- Pre-fork Serving ---
+def preload(names=None):
+    # Loads models in the server master so forked workers share the weights
+    # copy-on-write; no reaper runs here, the master never serves requests
+    names = names or list(_loaders)
+    for name in names:
+        if name not in _loaders:
+            raise KeyError(f"Unknown model: {name}")
+        _load(name)
+    return names
+
+
+def after_fork():
+    # Threads don't survive fork(), so each worker starts its own idle reaper
+    global _reaper
+    _reaper = None
+    if _models:
+        _ensure_reaper()
+
+
+def stats():
+    return {name: dict(values) for name, values in _stats.items()}
+
+
+# --- Built-in Models ---
+# torch / transformers / torchvision are imported inside the builders so that
+# importing this module (and the apps) stays cheap.
+def _build_blip():
+    from transformers import BlipProcessor, BlipForConditionalGeneration
+    processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
+    model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base")
+    model.eval()
+    return processor, model
+
+
+def _build_deeplabv3():
+    from torchvision import models
+    segmentation_model = models.segmentation.deeplabv3_resnet101(pretrained=True)
+    segmentation_model.eval()
+    return segmentation_model
+
+
+def _build_fasterrcnn():
+    from torchvision import models
+    # Score threshold / max detections / NMS are applied inside the ROI heads (see detection.py)
+    detection_model = models.detection.fasterrcnn_resnet50_fpn(pretrained=True, **detection.model_kwargs())
+    detection_model.eval()
+    return detection_model
+
+
+def _build_mobilenet_v3():
+    # ImageNet classifier used for weapon screening (weapon_screen.py)
+    from torchvision import models
+    screening_model = models.mobilenet_v3_small(pretrained=True)
+    screening_model.eval()
+    return screening_model
+
+
+# Plain fp32 eager models; the selected inference backend is applied on top
+EAGER_BUILDERS = {
+    "blip": _build_blip,
+    "deeplabv3": _build_deeplabv3,
+    "fasterrcnn": _build_fasterrcnn,
+    "mobilenet_v3": _build_mobilenet_v3,
+}
+
+for _name, _builder in EAGER_BUILDERS.items():
+    register(_name, lambda name=_name, builder=_builder: inference_backends.load(name, builder))
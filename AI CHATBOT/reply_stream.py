@@ -0,0 +1,86 @@
+import contextvars
+import json
+import queue
+import threading
+
+import vision_pipeline
+
+# --- Streaming Replies ---
+# POST /chat?stream=1 and image uploads to POST /upload?stream=1 (or either with
+# Accept: text/event-stream) answer with server-sent events instead of one
+# JSON body, so the browser has something to show right away:
+#
+#   event: start    sent immediately
+#   event: delta    {"text": ...}  image uploads: the next tokens of the caption
+#   event: stage    {"stage", "seconds"}  image uploads: an analysis finished
+#   event: result   the JSON the non-streaming route would have returned
+#   event: error    {"message": ...}
+#
+# Captions are streamed token by token while BLIP generates them. The intent
+# handlers build a chat reply in one go, so a chat stream is only the start
+# event (the page shows a placeholder) followed by the reply as its result.
+
+
+def wants_stream(request):
+    return (request.values.get("stream", "").lower() in ("1", "true", "yes")
+            or "text/event-stream" in request.headers.get("Accept", ""))
+
+
+def event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+def chat_events(reply_fn, message):
+    yield event("start", {})
+    try:
+        reply = reply_fn(message)
+    except Exception as e:
+        yield event("error", {"message": str(e)})
+        return
+    yield event("result", {"reply": reply})
+
+
+def start_upload(put, data, analyses, objects_in_caption=False, mask_format="png", detect_options=None):
+    # Runs the analyses on their own thread; put((name, data)) receives each
+    # caption token, stage timing and the result as they happen, then None
+    def work():
+        try:
+            image = vision_pipeline.decode_image(data)
+            result = vision_pipeline.analyze(
+                image, analyses, detect_options=detect_options,
+                progress=lambda stage, seconds: put(("stage", {"stage": stage, "seconds": round(seconds, 4)})),
+                on_caption_text=lambda text: put(("delta", {"text": text})))
+            put(("result", vision_pipeline.build_response(result, objects_in_caption, mask_format)))
+        except Exception as e:
+            put(("error", {"message": str(e)}))
+        put(None)
+
+    # Started in the request's context so model timings and the session id carry over
+    threading.Thread(target=contextvars.copy_context().run, args=(work,), name="upload-stream", daemon=True).start()
+
+
+def upload_events(data, analyses, objects_in_caption=False, mask_format="png", detect_options=None):
+    events = queue.Queue()
+    start_upload(events.put, data, analyses, objects_in_caption, mask_format, detect_options)
+    yield event("start", {})
+    while True:
+        item = events.get()
+        if item is None:
+            return
+        yield event(*item)
+
+
+# --- Flask Integration ---
+def _response(lines):
+    from flask import Response, stream_with_context
+    # X-Accel-Buffering keeps nginx from holding the events back
+    return Response(stream_with_context(lines), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def chat_response(reply_fn, message):
+    return _response(chat_events(reply_fn, message))
+
+
+def upload_response(data, analyses, objects_in_caption=False, mask_format="png", detect_options=None):
+    return _response(upload_events(data, analyses, objects_in_caption, mask_format, detect_options))
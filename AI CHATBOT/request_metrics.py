@@ -0,0 +1,197 @@
+import bisect
+import contextvars
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# --- Latency Metrics ---
+# Histograms of how long requests, chat intents, model calls and Wikipedia
+# fetches take, plus the counters the components already keep (cache hits,
+# math timeouts, queue rejections, ...), served in the Prometheus text format
+# on GET /metrics. Recording a value is a lock, a bisect and three additions.
+#
+# With OMNIBOT_SERVER_TIMING=1 every response also carries a Server-Timing
+# header (shown in the browser's network panel) with the total time and the
+# intent / Wikipedia / analysis timings recorded while serving it.
+
+SERVER_TIMING = os.environ.get("OMNIBOT_SERVER_TIMING", "0") == "1"
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+NAME_RE = re.compile(r"[^a-zA-Z0-9_]")
+
+# Timings of the request being served, when Server-Timing is on
+_timings = contextvars.ContextVar("omnibot_server_timing", default=None)
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets=BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # label values -> [count per bucket (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in sorted(series):
+            pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels)]
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                bucket_labels = ",".join(pairs + [f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            label_text = "{" + ",".join(pairs) + "}" if pairs else ""
+            lines.append(f"{self.name}_sum{label_text} {total:.6f}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            pairs = ",".join(f'{name}="{_escape(v)}"' for name, v in zip(self.label_names, labels))
+            lines.append(f"{self.name}{{{pairs}}} {value}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+requests = Histogram("omnibot_request_seconds", "Time to build a response, by route.", ("endpoint", "method", "status"))
+intents = Histogram("omnibot_intent_seconds", "Time spent in chat intent handlers.", ("intent",))
+models = Histogram("omnibot_model_seconds", "Model inference time, without waiting for a slot.", ("model",))
+model_waits = Histogram("omnibot_model_wait_seconds", "Time spent waiting for an inference slot.", ("model",))
+wikipedia = Histogram("omnibot_wikipedia_fetch_seconds", "Wikipedia article fetches that went to the network.", ("outcome",))
+errors = Counter("omnibot_errors_total", "Exceptions raised by routes and intent handlers.", ("source", "name"))
+METRICS = (requests, intents, models, model_waits, wikipedia, errors)
+
+
+def timing(name, seconds):
+    # Adds an entry to the current response's Server-Timing header, if it has one
+    entries = _timings.get()
+    if entries is not None:
+        entries.append((name, seconds))
+
+
+def observe(histogram, label, seconds, timing_name=None):
+    histogram.observe((label,), seconds)
+    if timing_name:
+        timing(timing_name, seconds)
+
+
+@contextmanager
+def timed(histogram, label, timing_name=None):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(histogram, label, time.perf_counter() - start, timing_name)
+
+
+def server_timing_header(entries, total):
+    parts = [f"total;dur={total * 1000:.1f}"]
+    parts += [f"{NAME_RE.sub('-', name)};dur={seconds * 1000:.1f}" for name, seconds in entries]
+    return ", ".join(parts)
+
+
+# --- Prometheus Text ---
+def _flatten(prefix, stats):
+    # Numeric values of a component's stats() dict; nested dicts become name_parts
+    for key, value in stats.items():
+        name = f"{prefix}_{NAME_RE.sub('_', str(key))}"
+        if isinstance(value, dict):
+            yield from _flatten(name, value)
+        elif isinstance(value, (int, float)):
+            yield name, float(value)
+
+
+def render(sources=None):
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    for prefix, stats in (sources or {}).items():
+        try:
+            values = list(_flatten(f"omnibot_{prefix}", stats()))
+        except Exception:
+            continue  # A broken component must not take /metrics down
+        for name, value in values:
+            lines += [f"# TYPE {name} untyped", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+# --- Flask Integration ---
+def init_app(app, sources=None):
+    # sources: {"cache": analysis_cache.cache.stats, ...} exported as omnibot_cache_*
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_timer():
+        g.request_started = time.perf_counter()
+        if SERVER_TIMING:
+            _timings.set([])
+
+    @app.after_request
+    def _record_request(response):
+        seconds = time.perf_counter() - g.request_started
+        requests.observe((request.endpoint or "unknown", request.method, str(response.status_code)), seconds)
+        if SERVER_TIMING:
+            response.headers["Server-Timing"] = server_timing_header(_timings.get() or [], seconds)
+        return response
+
+    @app.teardown_request
+    def _record_exception(exc):
+        if exc is not None:
+            errors.inc(("route", request.endpoint or "unknown"))
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(render(sources), mimetype="text/plain; version=0.0.4")
+
+
+# --- Quart Integration ---
+def init_async_app(app):
+    # Request timings for asgi.py; /metrics itself is the Flask app's route
+    from quart import g, request
+
+    @app.before_request
+    async def _start_timer():
+        g.request_started = time.perf_counter()
+        if SERVER_TIMING:
+            _timings.set([])
+
+    @app.after_request
+    async def _record_request(response):
+        seconds = time.perf_counter() - g.request_started
+        requests.observe((request.endpoint or "unknown", request.method, str(response.status_code)), seconds)
+        if SERVER_TIMING:
+            response.headers["Server-Timing"] = server_timing_header(_timings.get() or [], seconds)
+        return response
@@ -0,0 +1,112 @@
+import os
+
+from PIL import Image
+
+# --- Input Resize / Tiling Policy ---
+# Segmentation and detection cost grows with pixel count, so uploads are
+# bounded before they reach the models and results are mapped back to the
+# original image coordinates afterwards.
+#
+#   max_side       longest side fed to the models (0 = no limit)
+#   mode           "fit" keeps the aspect ratio, "letterbox" also pads to a
+#                  max_side x max_side square (stable shapes for exported models)
+#   tile_size      if > 0, large images are processed as overlapping tiles of
+#                  this size instead of being shrunk to max_side
+#   tile_overlap   pixels shared by neighbouring tiles
+#   tile_max_side  longest side an image is shrunk to before tiling
+
+POLICY = {
+    "max_side": int(os.environ.get("OMNIBOT_MAX_SIDE", "1024")),
+    "mode": os.environ.get("OMNIBOT_RESIZE_MODE", "fit"),
+    "tile_size": int(os.environ.get("OMNIBOT_TILE_SIZE", "0")),
+    "tile_overlap": int(os.environ.get("OMNIBOT_TILE_OVERLAP", "64")),
+    "tile_max_side": int(os.environ.get("OMNIBOT_TILE_MAX_SIDE", "2048")),
+}
+
+
+def tiling_enabled(policy):
+    return policy["tile_size"] > 0
+
+
+def bound_image(image: Image.Image, policy=None):
+    # Shrink once on the decoded image so every later tensor is already bounded
+    policy = policy or POLICY
+    info = {"original_size": image.size, "scale": (1.0, 1.0), "content_size": image.size}
+    limit = policy["tile_max_side"] if tiling_enabled(policy) else policy["max_side"]
+    width, height = image.size
+    if limit <= 0 or max(width, height) <= limit:
+        return image, info
+
+    ratio = limit / max(width, height)
+    size = (max(1, round(width * ratio)), max(1, round(height * ratio)))
+    resized = image.resize(size, Image.BILINEAR, reducing_gap=2.0)
+    info["scale"] = (size[0] / width, size[1] / height)
+    info["content_size"] = size
+    return resized, info
+
+
+def letterbox(tensor, policy=None):
+    # Pad right/bottom so the content keeps its (0, 0) origin
+    policy = policy or POLICY
+    if policy["mode"] != "letterbox" or tiling_enabled(policy) or policy["max_side"] <= 0:
+        return tensor
+    import torch.nn.functional as F
+    height, width = tensor.shape[-2:]
+    side = max(policy["max_side"], height, width)
+    return F.pad(tensor, (0, side - width, 0, side - height))
+
+
+def tile_windows(width, height, policy=None):
+    # Returns (window, core) pairs; each pixel belongs to exactly one core region,
+    # the overlap margins only give the model context across tile edges
+    policy = policy or POLICY
+    tile = policy["tile_size"]
+    if not tiling_enabled(policy) or (width <= tile and height <= tile):
+        return [((0, 0, width, height), (0, 0, width, height))]
+
+    overlap = min(policy["tile_overlap"], tile // 2)
+    xs = _tile_starts(width, tile, overlap)
+    ys = _tile_starts(height, tile, overlap)
+    margin = overlap // 2
+
+    windows = []
+    for y0 in ys:
+        for x0 in xs:
+            x1, y1 = min(x0 + tile, width), min(y0 + tile, height)
+            core = (
+                x0 + margin if x0 > 0 else 0,
+                y0 + margin if y0 > 0 else 0,
+                x1 - margin if x1 < width else width,
+                y1 - margin if y1 < height else height,
+            )
+            windows.append(((x0, y0, x1, y1), core))
+    return windows
+
+
+def _tile_starts(length, tile, overlap):
+    if length <= tile:
+        return [0]
+    step = tile - overlap
+    starts = list(range(0, length - tile, step))
+    starts.append(length - tile)  # Last tile sits flush with the edge
+    return starts
+
+
+def boxes_to_original(boxes, info):
+    scale_x, scale_y = info["scale"]
+    if (scale_x, scale_y) == (1.0, 1.0):
+        return boxes
+    width, height = info["original_size"]
+    boxes = boxes.clone()
+    boxes[:, 0::2] = (boxes[:, 0::2] / scale_x).clamp(0, width)
+    boxes[:, 1::2] = (boxes[:, 1::2] / scale_y).clamp(0, height)
+    return boxes
+
+
+def mask_to_original(mask: Image.Image, info):
+    content_width, content_height = info["content_size"]
+    if mask.size != (content_width, content_height):
+        mask = mask.crop((0, 0, content_width, content_height))  # Drop letterbox padding
+    if mask.size != info["original_size"]:
+        mask = mask.resize(info["original_size"], Image.NEAREST)
+    return mask
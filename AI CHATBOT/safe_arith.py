@@ -0,0 +1,153 @@
+import ast
+import operator
+import sys
+import time
+from functools import lru_cache
+
+# --- Safe Arithmetic Engine ---
+# Replacement for eval() on chat arithmetic. Expressions are parsed to an AST
+# and only numbers, + - * / // % ** and unary +/- are allowed. Sizes are
+# checked *before* each operation runs, so "9**9**9" is refused instantly
+# instead of pinning a core while Python builds a gigantic integer.
+
+MAX_LENGTH = 200  # characters
+MAX_NODES = 100
+MAX_BITS = 4096  # largest integer result, roughly 1200 decimal digits
+MAX_EXPONENT = 10000
+
+
+class ArithmeticLimitError(ValueError):
+    pass
+
+
+# What the chat answers for each limit
+LIMIT_REPLIES = {
+    "expression too long": "Sorry, that expression is too long for me to calculate.",
+    "expression too complex": "Sorry, that expression is too complex for me to calculate.",
+    "exponent too large": "Sorry, that exponent is too large for me to calculate.",
+    "result too large": "Sorry, that number is too large for me to calculate.",
+}
+
+
+def limit_reply(error):
+    return LIMIT_REPLIES.get(str(error), "Sorry, that is too large for me to calculate.")
+
+
+_BINARY = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+_UNARY = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+
+
+def _bits(value):
+    return abs(value).bit_length() if isinstance(value, int) else 0
+
+
+def _check_binary(op, left, right):
+    if isinstance(op, ast.Pow):
+        if abs(right) > MAX_EXPONENT:
+            raise ArithmeticLimitError("exponent too large")
+        if isinstance(left, int) and isinstance(right, int) and right > 0:
+            # |a ** b| has at most b * bits(a) bits
+            if _bits(left) * right > MAX_BITS:
+                raise ArithmeticLimitError("result too large")
+    elif isinstance(op, ast.Mult):
+        if _bits(left) + _bits(right) > MAX_BITS:
+            raise ArithmeticLimitError("result too large")
+
+
+def _compile(node):
+    # Turns the AST into nested closures once, so repeated evaluation skips the tree walk
+    if isinstance(node, ast.Expression):
+        return _compile(node.body)
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        value = node.value
+        return lambda: value
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY:
+        fn, operand = _UNARY[type(node.op)], _compile(node.operand)
+        return lambda: fn(operand())
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+        op, fn = node.op, _BINARY[type(node.op)]
+        left, right = _compile(node.left), _compile(node.right)
+
+        def run():
+            a, b = left(), right()
+            _check_binary(op, a, b)
+            return fn(a, b)
+        return run
+    raise ValueError(f"Unsupported expression: {type(node).__name__}")
+
+
+@lru_cache(maxsize=1024)
+def compile_expression(expression):
+    if len(expression) > MAX_LENGTH:
+        raise ArithmeticLimitError("expression too long")
+    tree = ast.parse(expression.strip(), mode="eval")
+    if sum(1 for _ in ast.walk(tree)) > MAX_NODES:
+        raise ArithmeticLimitError("expression too complex")
+    return _compile(tree)
+
+
+def evaluate(expression):
+    result = compile_expression(expression)()
+    if isinstance(result, float) and result != result:
+        raise ValueError("not a number")
+    return result
+
+
+def evaluate_batch(expressions):
+    # Evaluates many expressions in one call; duplicates are computed once and
+    # failures come back as None instead of aborting the batch
+    results = {}
+    for expression in set(expressions):
+        try:
+            results[expression] = evaluate(expression)
+        except (ArithmeticError, ValueError, SyntaxError, TypeError):
+            results[expression] = None
+    return [results[expression] for expression in expressions]
+
+
+# --- Benchmark ---
+# python safe_arith.py  -> per-expression cost against the old eval() path
+def benchmark(rounds=20000):
+    samples = ["2 + 3 * 4", "(10 - 4) / 3", "17 % 5", "2 ** 10", "3.5 * (2 + 8) - 1", "100 / 7 + 22 * 3"]
+    timings = {}
+
+    start = time.perf_counter()
+    for i in range(rounds):
+        eval(samples[i % len(samples)])
+    timings["eval_us"] = (time.perf_counter() - start) / rounds * 1e6
+
+    start = time.perf_counter()
+    for i in range(rounds):
+        compile_expression.__wrapped__(samples[i % len(samples)])()  # parse every time
+    timings["ast_cold_us"] = (time.perf_counter() - start) / rounds * 1e6
+
+    start = time.perf_counter()
+    for i in range(rounds):
+        evaluate(samples[i % len(samples)])
+    timings["ast_cached_us"] = (time.perf_counter() - start) / rounds * 1e6
+
+    start = time.perf_counter()
+    evaluate_batch([samples[i % len(samples)] for i in range(rounds)])
+    timings["batch_us"] = (time.perf_counter() - start) / rounds * 1e6
+
+    start = time.perf_counter()
+    try:
+        evaluate("9**9**9")
+    except ArithmeticLimitError:
+        pass
+    timings["reject_9**9**9_us"] = (time.perf_counter() - start) * 1e6
+    return {name: round(value, 2) for name, value in timings.items()}
+
+
+if __name__ == "__main__":
+    for name, value in benchmark().items():
+        print(f"{name:>20}: {value}")
+    sys.exit(0)
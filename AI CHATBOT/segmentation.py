@@ -1,43 +1,33 @@
 from flask import Flask, request, jsonify, render_template
 import datetime
 import re
-import json
-from sympy import symbols, Eq, solve, simplify, diff, integrate, limit, sympify
-import wikipedia
 import pytesseract
-from PIL import Image
 import pyttsx3
-import io
-import torch
-from transformers import BlipProcessor, BlipForConditionalGeneration
-from PyPDF2 import PdfReader
-import docx
-import torchvision.transforms as T
-from torchvision import models
+import model_registry
+import caption_batcher
+import vision_pipeline
+import analysis_cache
+import doc_extract
+import job_queue
+import reply_stream
+import request_metrics
+import inference_governor
+import mask_codec
+import detection
+import math_worker
+import safe_arith
 
 app = Flask(__name__)
 
-# --- Load Code Snippets from JSON ---
-with open('programs.json') as f:
-    code_snippets = json.load(f)
-
-# --- Memory for Wikipedia context ---
-last_wiki_topic = {"topic": None, "offset": 0}
-
-# --- Image Captioning Setup ---
-processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
-model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base")
-
-# --- Object Detection Model Setup (YOLO or FasterRCNN) ---
-# Load a pre-trained Faster R-CNN model for object detection
-detection_model = models.detection.fasterrcnn_resnet50_fpn(pretrained=True)
-detection_model.eval()
-
-def get_image_caption(image: Image.Image) -> str:
-    inputs = processor(images=image, return_tensors="pt")
-    out = model.generate(**inputs)
-    caption = processor.decode(out[0], skip_special_tokens=True)
-    return caption
+# --- Latency Metrics ---
+# GET /metrics (Prometheus text): route / intent / model histograms and these components' counters
+request_metrics.init_app(app, sources={
+    "cache": analysis_cache.cache.stats,
+    "caption": caption_batcher.batcher.metrics,
+    "math": math_worker.stats,
+    "job": job_queue.jobs.stats,
+    "inference": inference_governor.governor.stats,
+})
 
 # --- Basic Math Expression Evaluation ---
 def evaluate_math_expression(expression):
@@ -47,39 +37,19 @@ def evaluate_math_expression(expression):
         expression = expression.replace("x", "*").replace("into", "*")
         expression = expression.replace("divided by", "/").replace("mod", "%")
         if re.match(r"^[\d\s\+\-\*/%\.\(\)]+$", expression):
-            result = eval(expression)
+            # AST evaluator with size limits instead of eval(), so "9**9**9" can't hang the worker
+            result = safe_arith.evaluate(expression)
             return f"The answer is: {result}"
         return None
+    except safe_arith.ArithmeticLimitError as e:
+        return safe_arith.limit_reply(e)
     except Exception:
         return None
 
 # --- Advanced Math Solver ---
+# SymPy runs in the math worker pool with a per-job timeout, never on the request thread
 def advanced_math_solver(expression):
-    try:
-        x = symbols('x')
-        expression = expression.lower().replace("^", "**")
-
-        if "solve" in expression:
-            eq = expression.replace("solve", "").strip()
-            lhs, rhs = eq.split("=")
-            equation = Eq(sympify(lhs), sympify(rhs))
-            result = solve(equation, x)
-            return f"Solution: {result}"
-        elif "differentiate" in expression or "derivative" in expression:
-            expr = expression.replace("differentiate", "").replace("derivative", "").strip()
-            return f"Derivative: {diff(sympify(expr))}"
-        elif "integrate" in expression:
-            expr = expression.replace("integrate", "").strip()
-            return f"Integral: {integrate(sympify(expr))}"
-        elif "simplify" in expression:
-            expr = expression.replace("simplify", "").strip()
-            return f"Simplified: {simplify(sympify(expr))}"
-        elif "limit" in expression:
-            expr = expression.replace("limit", "").strip()
-            return f"Limit as x approaches ∞: {limit(sympify(expr), x, float('inf'))}"
-        return None
-    except Exception:
-        return "Sorry, I couldn't solve that. Try checking your expression."
+    return math_worker.advanced_math_solver(expression)
 
 # --- Disease Info Handler ---
 def get_disease_info(message):
@@ -146,44 +116,16 @@ def get_disease_info(message):
             )
     return None
 
-# --- Object Detection ---
-def detect_objects(image: Image.Image):
-    transform = T.Compose([T.ToTensor()])
-    img_tensor = transform(image).unsqueeze(0)
-    
-    with torch.no_grad():
-        predictions = detection_model(img_tensor)
-
-    labels = predictions[0]['labels']
-    scores = predictions[0]['scores']
-    boxes = predictions[0]['boxes']
-
-    detected_objects = []
-    object_count = 0
-    for label, score in zip(labels, scores):
-        if score > 0.5:  # confidence threshold
-            object_count += 1
-            detected_objects.append(f"Object: {label.item()}, Confidence: {score.item():.2f}")
-
-    return object_count, detected_objects
-
 # --- File Reading Functions ---
+# Pages / paragraphs come from doc_extract generators and are joined once
 def read_pdf_file(file):
-    reader = PdfReader(file)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text()
-    return text
+    return "".join(text for _, _, text in doc_extract.iter_pdf(file))
 
 def read_docx_file(file):
-    doc = docx.Document(file)
-    text = ""
-    for para in doc.paragraphs:
-        text += para.text + "\n"
-    return text
+    return "".join(text for _, _, text in doc_extract.iter_docx(file))
 
 def read_txt_file(file):
-    return file.read().decode("utf-8")
+    return "".join(text for _, _, text in doc_extract.iter_txt(file))
 
 # --- Image Recognition and Captioning ---
 @app.route('/upload', methods=['POST'])
@@ -194,25 +136,34 @@ def upload():
         try:
             # Handling image captioning
             if filename.endswith(('.png', '.jpg', '.jpeg', '.bmp')): 
-                img = Image.open(io.BytesIO(file.read()))
-                caption = get_image_caption(img)
-
-                # Weapon detection logic - Check for weapon-related keywords in caption
-                weapons = ["gun", "knife", "pistol", "bomb", "rifle"]
-                detected_weapons = [weapon for weapon in weapons if weapon in caption.lower()]
-
-                if detected_weapons:
-                    # Add a warning to the caption if a weapon is detected
-                    warning_message = f"⚠️ Warning: Possible weapon detected ({', '.join(detected_weapons)})."
-                    caption = warning_message + "\n" + caption
-
-                # Object segmentation and counting
-                object_count, detected_objects = detect_objects(img)
-                caption += f"\nDetected objects: {object_count}. Objects: {', '.join(detected_objects)}"
-
-                return jsonify({"caption": caption})
+                # Decode once and run the requested analyses (?analyses=caption,detect,segment)
+                analyses = vision_pipeline.parse_analyses(request.values.get("analyses"), default=("caption", "detect"))
+                # ?mask_format=png|palette|rle|polygons picks how the segmentation mask is encoded
+                mask_format = mask_codec.parse_format(request.values.get("mask_format"))
+                # ?score=, ?max_detections=, ?classes=person,dog narrow the detections
+                detect_options = detection.parse_options(request.values)
+                # ?async=1 queues the work and answers 202 with a job id to poll
+                if job_queue.wants_async(request):
+                    try:
+                        job = job_queue.jobs.submit(vision_pipeline.run_job, file.read(), analyses, objects_in_caption=True,
+                                                     mask_format=mask_format, detect_options=detect_options)
+                    except job_queue.QueueFull:
+                        return job_queue.busy()
+                    return job_queue.accepted(job)
+                # ?stream=1 sends the caption token by token (server-sent events), then the full result
+                if reply_stream.wants_stream(request):
+                    return reply_stream.upload_response(file.read(), analyses, objects_in_caption=True, mask_format=mask_format,
+                                                        detect_options=detect_options)
+                img = vision_pipeline.decode_image(file.read())
+                result = vision_pipeline.analyze(img, analyses, detect_options=detect_options)
+                # The object summary stays in the caption for existing clients
+                response = vision_pipeline.build_response(result, objects_in_caption=True, mask_format=mask_format)
+                return jsonify(response)
 
             # Handling text files (PDF, DOCX, TXT)
+            # ?stream=1 sends NDJSON page / paragraph chunks instead of one JSON body
+            elif filename.endswith(doc_extract.EXTENSIONS) and doc_extract.wants_stream(request):
+                return doc_extract.stream_response(file, filename)
             elif filename.endswith('.pdf'):
                 content = read_pdf_file(file)
                 return jsonify({"type": "text", "result": content})
@@ -230,11 +181,61 @@ def upload():
     
     return jsonify({"status": "no file uploaded"})
 
+@app.route('/upload/mask', methods=['POST'])
+def upload_mask():
+    # Segmentation mask only, without JSON: ?format=raw (uint8 class ids, default), png or palette
+    file = request.files.get('file') or request.files.get('image')
+    if not file:
+        return jsonify({"status": "no file uploaded"})
+    try:
+        mask_format = mask_codec.parse_format(request.values.get("format"), default="raw", formats=mask_codec.BINARY_FORMATS)
+        img = vision_pipeline.decode_image(file.read())
+        result = vision_pipeline.analyze(img, ("segment",))
+        if vision_pipeline.screened_out(result):
+            # OMNIBOT_WEAPON_SHORT_CIRCUIT: flagged images get the screening verdict instead of a mask
+            return jsonify(dict(vision_pipeline.build_response(result), status="error",
+                                message="Image flagged by weapon screening; no mask was computed.")), 422
+        return mask_codec.binary_response(result["segmentation"], mask_format)
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)})
+
 # --- Routes ---
 @app.route("/")
 def index():
     return render_template("index.html")
 
+@app.route("/models")
+def models_status():
+    return jsonify(model_registry.stats())
+
+@app.route("/caption-metrics")
+def caption_metrics():
+    return jsonify(caption_batcher.batcher.metrics())
+
+@app.route("/cache-metrics")
+def cache_metrics():
+    return jsonify(analysis_cache.cache.stats())
+
+@app.route("/math-metrics")
+def math_metrics():
+    return jsonify(math_worker.stats())
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    return job_queue.status_response(job_id)
+
+@app.route("/jobs/<job_id>/events")
+def job_events(job_id):
+    return job_queue.events_response(job_id)
+
+@app.route("/job-metrics")
+def job_metrics():
+    return jsonify(job_queue.jobs.stats())
+
+@app.route("/inference-metrics")
+def inference_metrics():
+    return jsonify(inference_governor.governor.stats())
+
 @app.route("/chat", methods=["POST"])
 def chat():
     user_message = request.json.get("message", "")
@@ -0,0 +1,199 @@
+import contextvars
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# --- Per-Session Conversation State ---
+# Conversation context (e.g. the current Wikipedia topic) is stored per
+# browser session, keyed by a cookie, instead of in a module-level dict shared
+# by every user. Backends:
+#
+#   memory  in-process LRU with TTL (default; one worker process)
+#   sqlite  a local SQLite file shared by every worker on the host
+#   redis   any Redis-compatible server shared by every host
+#
+# Pick one with OMNIBOT_SESSION_BACKEND.
+
+BACKEND = os.environ.get("OMNIBOT_SESSION_BACKEND", "memory")
+TTL = float(os.environ.get("OMNIBOT_SESSION_TTL", "3600"))
+MAX_SESSIONS = int(os.environ.get("OMNIBOT_SESSION_MAX", "10000"))
+SQLITE_PATH = os.environ.get("OMNIBOT_SESSION_SQLITE", "sessions.db")
+REDIS_URL = os.environ.get("OMNIBOT_REDIS_URL", "redis://localhost:6379/0")
+
+COOKIE_NAME = "omnibot_sid"
+LOCAL_SESSION = "local"  # used outside of a request, e.g. from a shell
+
+# Set per request by the asyncio app (asgi.py), where flask.g is not available
+_session_id = contextvars.ContextVar("omnibot_session_id", default=None)
+
+
+class MemorySessionStore:
+    def __init__(self, ttl=TTL, max_sessions=MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            item = self._data.get(session_id)
+            if item is None:
+                return {}
+            expires, state = item
+            if expires < time.monotonic():
+                del self._data[session_id]
+                return {}
+            self._data.move_to_end(session_id)
+            return json.loads(state)
+
+    def set(self, session_id, state):
+        # Stored serialised so callers can't mutate shared state by accident
+        with self._lock:
+            self._data[session_id] = (time.monotonic() + self.ttl, json.dumps(state))
+            self._data.move_to_end(session_id)
+            while len(self._data) > self.max_sessions:
+                self._data.popitem(last=False)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._data.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteSessionStore:
+    PURGE_EVERY = 500  # writes between expired-row cleanups
+
+    def __init__(self, path=SQLITE_PATH, ttl=TTL):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS sessions "
+                         "(id TEXT PRIMARY KEY, state TEXT NOT NULL, expires REAL NOT NULL)")
+
+    def _connect(self):
+        # One connection per thread; WAL lets several worker processes read while one writes
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id):
+        row = self._connect().execute(
+            "SELECT state FROM sessions WHERE id = ? AND expires >= ?", (session_id, time.time())).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def set(self, session_id, state):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO sessions (id, state, expires) VALUES (?, ?, ?)",
+                         (session_id, json.dumps(state), time.time() + self.ttl))
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                conn.execute("DELETE FROM sessions WHERE expires < ?", (time.time(),))
+
+    def delete(self, session_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+class RedisSessionStore:
+    def __init__(self, url=REDIS_URL, ttl=TTL, prefix="omnibot:session:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The redis session backend needs redis-py (pip install redis)")
+        self._client = redis.Redis.from_url(url)
+        self.ttl = int(ttl)
+        self.prefix = prefix
+
+    def get(self, session_id):
+        value = self._client.get(self.prefix + session_id)
+        return json.loads(value) if value else {}
+
+    def set(self, session_id, state):
+        self._client.set(self.prefix + session_id, json.dumps(state), ex=self.ttl)
+
+    def delete(self, session_id):
+        self._client.delete(self.prefix + session_id)
+
+    def __len__(self):
+        return sum(1 for _ in self._client.scan_iter(self.prefix + "*"))
+
+
+def create_store(backend=BACKEND):
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend == "redis":
+        return RedisSessionStore()
+    return MemorySessionStore()
+
+
+store = create_store()
+
+
+# --- Flask Integration ---
+def init_app(app):
+    # Every request gets a session id. The cookie is sent back on every
+    # response, so it expires TTL after the user's last request, not their first
+    from flask import g, request
+
+    @app.before_request
+    def _load_session_id():
+        g.session_id = request.cookies.get(COOKIE_NAME) or secrets.token_urlsafe(16)
+
+    @app.after_request
+    def _set_session_cookie(response):
+        if "session_id" in g:
+            response.set_cookie(COOKIE_NAME, g.session_id, max_age=int(TTL), httponly=True, samesite="Lax")
+        return response
+
+
+# --- Quart Integration ---
+def init_async_app(app):
+    # Same cookie as init_app; the id lives in a context variable, which is
+    # copied into the threads asgi.run_blocking() hands work to
+    from quart import request
+
+    @app.before_request
+    async def _load_session_id():
+        _session_id.set(request.cookies.get(COOKIE_NAME) or secrets.token_urlsafe(16))
+
+    @app.after_request
+    async def _set_session_cookie(response):
+        if _session_id.get() is not None:
+            response.set_cookie(COOKIE_NAME, _session_id.get(), max_age=int(TTL), httponly=True, samesite="Lax")
+        return response
+
+
+def current_session_id():
+    session_id = _session_id.get()
+    if session_id is not None:
+        return session_id
+    try:
+        from flask import g, has_request_context
+    except ImportError:
+        return LOCAL_SESSION
+    if has_request_context() and "session_id" in g:
+        return g.session_id
+    return LOCAL_SESSION
+
+
+def load():
+    return store.get(current_session_id())
+
+
+def save(state):
+    store.set(current_session_id(), state)
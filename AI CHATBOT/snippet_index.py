@@ -0,0 +1,220 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+import intent_router
+
+# --- Program Snippet Index ---
+# programs.json is indexed once: an exact-phrase matcher over the lowercased
+# keys, a token -> keys inverted index, and a deletion index for typo-tolerant
+# token matching ("buble sort", "fibonaci"). The file is re-read automatically
+# when it changes on disk.
+
+RELOAD_CHECK_SECONDS = 1.0
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def max_edits(token):
+    # Words under five letters get no typo tolerance, otherwise "sort" would match "port"
+    if len(token) < 5:
+        return 0
+    return 1 if len(token) < 8 else 2
+
+
+def _deletes(token, edits):
+    variants = {token}
+    frontier = {token}
+    for _ in range(edits):
+        frontier = {word[:i] + word[i + 1:] for word in frontier for i in range(len(word))}
+        variants |= frontier
+    return variants
+
+
+def edit_distance(a, b, limit):
+    # Damerau-Levenshtein (optimal string alignment), stops early past limit
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class SnippetIndex:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked = 0.0
+        self.reload()
+
+    def reload(self):
+        with self._lock:
+            mtime = os.path.getmtime(self.path)
+            with open(self.path) as f:
+                code_snippets = json.load(f)
+            self._build(code_snippets)
+            self._mtime = mtime
+
+    def _build(self, code_snippets):
+        keys = list(code_snippets)
+        exact = intent_router.IntentRouter(
+            [{"name": key, "contains": [key.lower()], "handler": None} for key in keys])
+
+        key_tokens = {}
+        inverted = {}
+        deletes = {}
+        for key in keys:
+            tokens = set(tokenize(key))
+            key_tokens[key] = tokens
+            for token in tokens:
+                inverted.setdefault(token, set()).add(key)
+        for token in inverted:
+            for variant in _deletes(token, max_edits(token)):
+                deletes.setdefault(variant, set()).add(token)
+
+        # Swap the whole index in one assignment so concurrent lookups never see a half-built one
+        self._state = {
+            "code_snippets": code_snippets,
+            "keys": keys,
+            "order": {key: i for i, key in enumerate(keys)},
+            "exact": exact,
+            "key_tokens": key_tokens,
+            "inverted": inverted,
+            "deletes": deletes,
+        }
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked < RELOAD_CHECK_SECONDS:
+            return
+        self._checked = now
+        try:
+            changed = os.path.getmtime(self.path) != self._mtime
+        except OSError:
+            return
+        if changed:
+            try:
+                self.reload()
+            except (OSError, ValueError):
+                pass  # Keep serving the last good index while the file is mid-write
+
+    def _match_token(self, state, token):
+        # Vocabulary tokens within the allowed edit distance -> distance
+        if token in state["inverted"]:
+            return {token: 0}
+        edits = max_edits(token)
+        if not edits:
+            return {}
+        matches = {}
+        for variant in _deletes(token, edits):
+            for candidate in state["deletes"].get(variant, ()):
+                if candidate not in matches:
+                    limit = min(edits, max_edits(candidate))
+                    distance = edit_distance(token, candidate, limit)
+                    if distance <= limit:
+                        matches[candidate] = distance
+        return matches
+
+    def _find(self, state, message):
+        message = message.lower()
+
+        # 1. Exact phrase anywhere in the message; earliest key in the file wins
+        matched = state["exact"].scan(message)
+        if matched:
+            return state["keys"][min(matched)]
+
+        # 2. Every token of a key present in the message, allowing typos
+        token_matches = {}
+        for token in set(tokenize(message)):
+            for vocab, distance in self._match_token(state, token).items():
+                if distance < token_matches.get(vocab, distance + 1):
+                    token_matches[vocab] = distance
+
+        best = None
+        candidates = set()
+        for vocab in token_matches:
+            candidates |= state["inverted"][vocab]
+        for key in candidates:
+            tokens = state["key_tokens"][key]
+            if not tokens or not tokens <= token_matches.keys():
+                continue
+            # Prefer longer keys, then fewer typos, then file order
+            score = (-len(tokens), sum(token_matches[t] for t in tokens), state["order"][key])
+            if best is None or score < best[0]:
+                best = (score, key)
+        return best[1] if best else None
+
+    def find(self, message):
+        self._maybe_reload()
+        return self._find(self._state, message)
+
+    def lookup(self, message):
+        # (key, code) for the best matching snippet, or None
+        self._maybe_reload()
+        state = self._state
+        key = self._find(state, message)
+        if key is None:
+            return None
+        return key, state["code_snippets"][key]
+
+
+# --- Benchmark ---
+# python snippet_index.py  -> lookup latency on a synthetic 10k-entry corpus
+def benchmark(entries=10000, lookups=2000):
+    import random
+    import string
+    import tempfile
+
+    rng = random.Random(3)
+    vocabulary = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10))) for _ in range(3000)]
+    corpus = {}
+    while len(corpus) < entries:
+        corpus[" ".join(rng.sample(vocabulary, rng.randint(1, 3)))] = "print('hello')"
+
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump(corpus, f)
+    try:
+        start = time.perf_counter()
+        index = SnippetIndex(f.name)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        keys = list(corpus)
+        messages = []
+        for _ in range(lookups):
+            key = rng.choice(keys)
+            if rng.random() < 0.5:
+                # Drop one letter from the longest word to simulate a typo
+                word = max(key.split(), key=len)
+                i = rng.randrange(len(word))
+                key = key.replace(word, word[:i] + word[i + 1:], 1)
+            messages.append(f"show me the {key} program")
+
+        start = time.perf_counter()
+        found = sum(1 for message in messages if index.find(message))
+        per_lookup_us = (time.perf_counter() - start) / lookups * 1e6
+    finally:
+        os.remove(f.name)
+    return {"entries": entries, "build_ms": round(build_ms, 1),
+            "lookup_us": round(per_lookup_us, 1), "found": found, "lookups": lookups}
+
+
+if __name__ == "__main__":
+    print(benchmark())
+    sys.exit(0)
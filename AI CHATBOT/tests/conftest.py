@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+# The app modules live flat in "AI CHATBOT/", next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def stub_models(monkeypatch):
+    # vision_pipeline without models: inputs are placeholders, the cache starts
+    # empty and segmentation returns a blank mask. Returns the segmented inputs.
+    import analysis_cache
+    import request_metrics
+    import vision_pipeline
+    from PIL import Image
+
+    monkeypatch.setattr(analysis_cache, "cache", analysis_cache.AnalysisCache(disk_dir=""))
+    monkeypatch.setattr(vision_pipeline, "prepare_inputs",
+                        lambda image, analyses, policy=None: ({name: name for name in analyses}, None))
+    segmented = []
+
+    def segment_image(input_tensor, info, policy=None):
+        segmented.append(input_tensor)
+        request_metrics.timing("model-deeplabv3", 0.25)  # What inference_governor records
+        return Image.new("L", (8, 8))
+
+    monkeypatch.setattr(vision_pipeline, "segment_image", segment_image)
+    return segmented
@@ -0,0 +1,37 @@
+import os
+
+import analysis_cache
+
+
+def test_disk_tier_round_trip(tmp_path):
+    cache = analysis_cache.AnalysisCache(disk_dir=str(tmp_path))
+    cache.put("k", {"caption": "a cat"})
+    fresh = analysis_cache.AnalysisCache(disk_dir=str(tmp_path))
+    assert fresh.get("k") == (True, {"caption": "a cat"})
+    assert os.listdir(tmp_path) == ["k.pkl"]  # No temp files left behind
+
+
+def test_directory_is_listed_only_when_over_the_limit(tmp_path, monkeypatch):
+    cache = analysis_cache.AnalysisCache(disk_dir=str(tmp_path), disk_max_mb=1)
+    listings = []
+    real_listdir = os.listdir
+    monkeypatch.setattr(analysis_cache.os, "listdir", lambda path: listings.append(path) or real_listdir(path))
+
+    for i in range(5):
+        cache.put(f"small{i}", b"x" * 1000)
+    assert len(listings) == 1  # The first write sizes the directory
+
+    for i in range(3):
+        cache.put(f"big{i}", b"x" * 400 * 1024)
+    assert len(listings) == 2
+    total = sum(os.path.getsize(tmp_path / name) for name in real_listdir(tmp_path))
+    assert total <= 1024 * 1024
+    assert cache.stats()["disk_evictions"] >= 1
+
+
+def test_overwriting_an_entry_keeps_the_running_size(tmp_path):
+    cache = analysis_cache.AnalysisCache(disk_dir=str(tmp_path))
+    cache.put("k", b"x" * 5000)
+    for _ in range(5):
+        cache.put("k", b"x" * 5000)
+    assert cache._disk_bytes == os.path.getsize(tmp_path / "k.pkl")
@@ -0,0 +1,17 @@
+import doc_index
+import session_store
+
+
+def test_answer_falls_through_without_documents(monkeypatch):
+    monkeypatch.setattr(doc_index, "store", doc_index.IndexStore())
+    monkeypatch.setattr(session_store, "current_session_id", lambda: "nobody")
+    assert doc_index.answer("what is the pdf format") is None
+
+
+def test_answer_searches_the_session_documents(monkeypatch):
+    monkeypatch.setattr(doc_index, "store", doc_index.IndexStore())
+    monkeypatch.setattr(session_store, "current_session_id", lambda: "s1")
+    doc_index.add_document("terms.txt", [("paragraph", (1, 1), "Refunds are issued within 14 days.\n")])
+    assert "terms.txt" in doc_index.answer("what does the document say about refunds")
+    assert doc_index.answer("what does the document say about shipping") == \
+        "I couldn't find anything about that in your documents."
@@ -0,0 +1,67 @@
+import io
+import json
+
+import doc_extract
+import doc_index
+
+
+def _stream(store, text, session_id="s1"):
+    lines = doc_extract.ndjson_lines(io.BytesIO(text.encode()), "notes.txt",
+                                     ingest=lambda name: store.open(session_id, name))
+    return [json.loads(line) for line in lines]
+
+
+def test_streamed_document_is_indexed_piece_by_piece(monkeypatch):
+    monkeypatch.setattr(doc_extract, "CHUNK_CHARS", 40)
+    store = doc_index.IndexStore()
+    text = "".join(f"paragraph {n} mentions refunds{n}\n" for n in range(20))
+    lines = _stream(store, text)
+    assert lines[-1]["type"] == "done" and len(lines) > 2
+    assert "refunds7" in store.search("s1", "refunds7")[0][4]
+    assert store.stats()["documents"] == 1
+
+
+def test_streamed_document_stops_at_the_character_budget(monkeypatch):
+    monkeypatch.setattr(doc_extract, "CHUNK_CHARS", 40)
+    store = doc_index.IndexStore(max_chars=100)
+    text = "".join(f"paragraph {n} mentions refunds{n}\n" for n in range(20))
+    _stream(store, text)
+    assert 0 < store.stats()["chars"] <= 100
+    assert store.search("s1", "refunds19") == []
+
+
+class RecordingSink:
+    def __init__(self):
+        self.calls = []
+
+    def add(self, piece):
+        self.calls.append("add")
+
+    def close(self):
+        self.calls.append("close")
+
+    def discard(self):
+        self.calls.append("discard")
+
+
+def test_failed_extraction_discards_the_partial_document(monkeypatch):
+    def iter_document(file, filename, timings=None):
+        yield "page", (1, 1), "first page"
+        raise ValueError("broken page 2")
+
+    monkeypatch.setattr(doc_extract, "iter_document", iter_document)
+    sink = RecordingSink()
+    lines = [json.loads(line) for line in doc_extract.ndjson_lines(io.BytesIO(), "report.pdf", ingest=lambda name: sink)]
+
+    assert lines[-1] == {"type": "error", "message": "broken page 2"}
+    assert sink.calls == ["add", "discard"]
+
+
+def test_abandoned_stream_discards_the_partial_document(monkeypatch):
+    monkeypatch.setattr(doc_extract, "CHUNK_CHARS", 40)
+    sink = RecordingSink()
+    text = "".join(f"paragraph {n} mentions refunds{n}\n" for n in range(20))
+    lines = doc_extract.ndjson_lines(io.BytesIO(text.encode()), "notes.txt", ingest=lambda name: sink)
+    next(lines)
+    lines.close()  # The client disconnected
+    assert sink.calls == ["add", "discard"]
@@ -0,0 +1,32 @@
+import asyncio
+
+import job_queue
+
+
+def run_job(job, value):
+    with job.stage("work"):
+        return value * 2
+
+
+def test_async_event_stream_follows_a_job():
+    queue = job_queue.JobQueue(workers=1)
+
+    async def follow():
+        job = queue.submit(run_job, 21)
+        return [line async for line in job_queue.event_lines_async(job)]
+
+    lines = asyncio.run(follow())
+    assert lines[-1].startswith("event: result")
+    assert '"result": 42' in lines[-1]
+    assert any(line.startswith("event: stage") for line in lines)
+
+
+def test_wait_async_times_out_without_events():
+    job = job_queue.Job(run_job, (1,), {})
+    job.events.append({"event": "status", "status": "queued"})
+
+    async def wait():
+        return await job.wait_async(1, 0.05)
+
+    assert asyncio.run(wait()) == []
+    assert not job._watchers
@@ -0,0 +1,20 @@
+import pytest
+
+import safe_arith
+
+
+def test_evaluates_plain_arithmetic():
+    assert safe_arith.evaluate("2 + 3 * 4") == 14
+    assert safe_arith.evaluate("2 ** 10") == 1024
+
+
+@pytest.mark.parametrize("expression, reply", [
+    ("9**9**9", "exponent is too large"),
+    ("99999999 ** 5000", "number is too large"),
+    ("1+" * 150 + "1", "expression is too long"),
+    ("(1+1)*" * 30 + "1", "expression is too complex"),
+])
+def test_each_limit_has_its_own_reply(expression, reply):
+    with pytest.raises(safe_arith.ArithmeticLimitError) as error:
+        safe_arith.evaluate(expression)
+    assert reply in safe_arith.limit_reply(error.value)
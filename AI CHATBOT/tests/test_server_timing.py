@@ -0,0 +1,18 @@
+from PIL import Image
+
+import request_metrics
+import vision_pipeline
+import weapon_screen
+
+
+def test_model_timings_from_pipeline_threads_reach_the_request(stub_models, monkeypatch):
+    monkeypatch.setattr(weapon_screen, "ENABLED", False)
+    entries = []
+    token = request_metrics._timings.set(entries)
+    try:
+        vision_pipeline.analyze(Image.new("RGB", (8, 8)), ("segment",))
+    finally:
+        request_metrics._timings.reset(token)
+
+    names = [name for name, _ in entries]
+    assert "model-deeplabv3" in names and "segment" in names
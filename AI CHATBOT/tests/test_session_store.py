@@ -0,0 +1,29 @@
+from flask import Flask
+
+import session_store
+
+
+def make_app():
+    app = Flask(__name__)
+    session_store.init_app(app)
+
+    @app.route("/")
+    def index():
+        return session_store.current_session_id()
+
+    return app
+
+
+def test_new_visitor_gets_a_session_cookie():
+    response = make_app().test_client().get("/")
+    cookie = response.headers["Set-Cookie"]
+    assert cookie.startswith(f"{session_store.COOKIE_NAME}={response.get_data(as_text=True)};")
+    assert f"Max-Age={int(session_store.TTL)}" in cookie
+
+
+def test_returning_visitor_gets_the_cookie_refreshed():
+    client = make_app().test_client()
+    client.set_cookie(session_store.COOKIE_NAME, "abc")
+    response = client.get("/")
+    assert response.get_data(as_text=True) == "abc"
+    assert response.headers["Set-Cookie"].startswith(f"{session_store.COOKIE_NAME}=abc;")
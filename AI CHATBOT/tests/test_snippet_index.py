@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+import snippet_index
+
+SNIPPETS = {
+    "bubble sort": "# bubble sort",
+    "port scanner": "# port scanner",
+    "fibonacci series": "# fibonacci",
+}
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = tmp_path / "programs.json"
+    path.write_text(json.dumps(SNIPPETS))
+    return snippet_index.SnippetIndex(str(path))
+
+
+def test_exact_phrase(index):
+    assert index.find("show me the bubble sort program") == "bubble sort"
+
+
+def test_typos_in_long_words_still_match(index):
+    assert index.find("buble sort") == "bubble sort"
+    assert index.find("fibonaci series") == "fibonacci series"
+
+
+@pytest.mark.parametrize("message", ["sort scanner", "bubble port", "bubble srot"])
+def test_short_words_need_an_exact_match(index, message):
+    assert index.find(message) is None
+
+
+def test_lookup_returns_the_code(index):
+    assert index.lookup("port scanner please") == ("port scanner", "# port scanner")
@@ -0,0 +1,65 @@
+import pytest
+from PIL import Image
+
+import analysis_cache
+import vision_pipeline
+import weapon_screen
+
+FLAGGED = {"flagged": True, "scores": {"gun": 0.9, "knife": 0.0, "explosive": 0.0}, "hits": ["gun"]}
+CLEAR = {"flagged": False, "scores": {"gun": 0.0, "knife": 0.0, "explosive": 0.0}, "hits": []}
+
+
+@pytest.fixture
+def pipeline(stub_models, monkeypatch):
+    monkeypatch.setattr(weapon_screen, "ENABLED", True)
+    monkeypatch.setattr(weapon_screen, "SHORT_CIRCUIT", True)
+    return stub_models
+
+
+def test_flagged_image_skips_segmentation(pipeline, monkeypatch):
+    monkeypatch.setattr(weapon_screen, "screen_tensor", lambda input_tensor: dict(FLAGGED))
+    result = vision_pipeline.analyze(Image.new("RGB", (8, 8)), ("segment",))
+
+    assert vision_pipeline.screened_out(result)
+    assert "segmentation" not in result
+    assert pipeline == []
+
+
+def test_short_circuit_response_carries_the_verdict(pipeline, monkeypatch):
+    monkeypatch.setattr(weapon_screen, "screen_tensor", lambda input_tensor: dict(FLAGGED))
+    result = vision_pipeline.analyze(Image.new("RGB", (8, 8)), ("segment",))
+    response = vision_pipeline.build_response(result)
+
+    assert response["screening"]["flagged"]
+    assert response["screening"]["short_circuit"]
+    assert response["caption"] == weapon_screen.warning(["gun"])
+
+
+def test_clear_image_is_segmented(pipeline, monkeypatch):
+    monkeypatch.setattr(weapon_screen, "screen_tensor", lambda input_tensor: dict(CLEAR))
+    result = vision_pipeline.analyze(Image.new("RGB", (8, 8)), ("segment",))
+
+    assert not vision_pipeline.screened_out(result)
+    assert result["segmentation"].size == (8, 8)
+    assert pipeline == ["segment"]
+
+
+def test_short_circuit_off_runs_everything(pipeline, monkeypatch):
+    monkeypatch.setattr(weapon_screen, "SHORT_CIRCUIT", False)
+    monkeypatch.setattr(weapon_screen, "screen_tensor", lambda input_tensor: dict(FLAGGED))
+    result = vision_pipeline.analyze(Image.new("RGB", (8, 8)), ("segment",))
+
+    assert not vision_pipeline.screened_out(result)
+    assert "segmentation" in result
+
+
+def test_screen_cache_key_follows_thresholds(monkeypatch):
+    before = analysis_cache.make_key("pixels", "screen")
+    monkeypatch.setitem(weapon_screen.THRESHOLDS, "gun", weapon_screen.THRESHOLDS["gun"] + 0.1)
+    assert analysis_cache.make_key("pixels", "screen") != before
+
+
+def test_screen_cache_key_follows_categories(monkeypatch):
+    before = analysis_cache.make_key("pixels", "screen")
+    monkeypatch.setattr(weapon_screen, "CATEGORIES", ["knife"])
+    assert analysis_cache.make_key("pixels", "screen") != before
@@ -0,0 +1,59 @@
+import asyncio
+import io
+import json
+
+import pytest
+
+import wiki_store
+
+ARTICLE = {"query": {"pages": {"1": {"title": "Ada Lovelace", "extract": "Ada was a mathematician. She wrote notes."}}}}
+
+
+def test_sync_fetch_uses_the_search_query(monkeypatch):
+    requested = []
+
+    def urlopen(request, timeout):
+        requested.append(request.full_url)
+        return io.BytesIO(json.dumps(ARTICLE).encode())
+
+    monkeypatch.setattr(wiki_store.urllib.request, "urlopen", urlopen)
+    assert wiki_store._fetch_online("ada lovelace").startswith("Ada was")
+    assert "generator=search" in requested[0] and "gsrsearch=ada+lovelace" in requested[0]
+
+
+def test_failed_topics_are_not_fetched_again_until_the_miss_expires():
+    calls = []
+
+    def fetch(topic):
+        calls.append(topic)
+        raise OSError("offline")
+
+    store = wiki_store.WikiStore(dump_path="", offline=False, fetch=fetch, miss_ttl=60)
+    for _ in range(3):
+        with pytest.raises(LookupError):
+            store.sentences("nowhere")
+    assert calls == ["nowhere"]
+    assert store.stats()["miss_hits"] == 2
+
+    store._misses["nowhere"] = 0  # Expired
+    with pytest.raises(LookupError):
+        store.sentences("nowhere")
+    assert len(calls) == 2
+
+
+def test_prefetch_honours_the_miss_cache():
+    calls = []
+
+    async def fetch(topic):
+        calls.append(topic)
+        raise LookupError(topic)
+
+    store = wiki_store.WikiStore(dump_path="", offline=False, miss_ttl=60)
+
+    async def ask_twice():
+        for _ in range(2):
+            with pytest.raises(LookupError):
+                await store.prefetch("nowhere", fetch)
+
+    asyncio.run(ask_twice())
+    assert calls == ["nowhere"]
@@ -1,38 +1,35 @@
 from flask import Flask, request, jsonify, render_template
 import datetime
+import intent_router
 
 app = Flask(__name__)
 
+def current_time():
+    now = datetime.datetime.now()
+    return f"{now.hour} Hour : {now.minute} Minute"
+
+# --- Intent Table ---
+# Highest priority first, compiled once into a single matcher
+INTENTS = [
+    {"name": "name", "contains": ["what is your name"], "handler": intent_router.reply("My name is Virtual Assistant")},
+    {"name": "greeting", "contains": ["hello", "hye", "hay", "hi"], "handler": intent_router.reply("Hey sir, how can I help you!")},
+    {"name": "how_are_you", "contains": ["how are you"], "handler": intent_router.reply("I am doing great these days, sir.")},
+    {"name": "thanks", "contains": ["thanku", "thank"], "handler": intent_router.reply("It's my pleasure, sir, to stay with you.")},
+    {"name": "good_morning", "contains": ["good morning"], "handler": intent_router.reply("Good morning sir, I think you might need some help.")},
+    {"name": "time", "contains": ["time now"], "handler": lambda message, match: current_time()},
+    {"name": "open_youtube", "contains": ["open youtube"], "handler": intent_router.reply("OPEN_YOUTUBE")},
+    {"name": "open_google", "contains": ["open google"], "handler": intent_router.reply("OPEN_GOOGLE")},
+    {"name": "open_facebook", "contains": ["open facebook"], "handler": intent_router.reply("OPEN_FACEBOOK")},
+    {"name": "open_sbtet", "contains": ["open sbtet"], "handler": intent_router.reply("OPEN_SBTET")},
+    {"name": "open_music", "contains": ["open music"], "handler": intent_router.reply("OPEN_MUSIC")},
+    {"name": "shutdown", "contains": ["shutdown", "quit"], "handler": intent_router.reply("Ok sir. Shutting down.")},
+]
+
+router = intent_router.IntentRouter(INTENTS)
+
 def assistant_logic(send):
     data_btn = send.lower()
-
-    if "what is your name" in data_btn:
-        return "My name is Virtual Assistant"
-    elif "hello" in data_btn or "hye" in data_btn or "hay" in data_btn or "hi" in data_btn:
-        return "Hey sir, how can I help you!"
-    elif "how are you" in data_btn:
-        return "I am doing great these days, sir."
-    elif "thanku" in data_btn or "thank" in data_btn:
-        return "It's my pleasure, sir, to stay with you."
-    elif "good morning" in data_btn:
-        return "Good morning sir, I think you might need some help."
-    elif "time now" in data_btn:
-        now = datetime.datetime.now()
-        return f"{now.hour} Hour : {now.minute} Minute"
-    elif "open youtube" in data_btn:
-        return "OPEN_YOUTUBE"
-    elif "open google" in data_btn:
-        return "OPEN_GOOGLE"
-    elif "open facebook" in data_btn:
-        return "OPEN_FACEBOOK"
-    elif "open sbtet" in data_btn:
-        return "OPEN_SBTET"
-    elif "open music" in data_btn:
-        return "OPEN_MUSIC"
-    elif "shutdown" in data_btn or "quit" in data_btn:
-        return "Ok sir. Shutting down."
-    else:
-        return "Sorry I'm still at Training state couldn't responde to your requirements"
+    return router.dispatch(data_btn, default="Sorry I'm still at Training state couldn't responde to your requirements")
 
 
 @app.route("/")
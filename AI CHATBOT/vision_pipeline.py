@@ -0,0 +1,231 @@
+import contextvars
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+import analysis_cache
+import caption_batcher
+import detection
+import inference_governor
+import mask_codec
+import model_registry
+import request_metrics
+import resize_policy
+import weapon_screen
+
+# --- Unified Image Analysis Pipeline ---
+# An upload is decoded once and converted to a tensor once; every selected
+# analysis (caption / detect / segment) is derived from that single buffer and
+# the analyses run concurrently. Weapon screening runs first, on its own, so a
+# flagged image can skip the heavy models (see weapon_screen.py).
+
+ANALYSES = ("screen", "caption", "detect", "segment")
+RESULT_KEYS = {"screen": "screening", "caption": "caption", "detect": "objects", "segment": "segmentation"}
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
+# torch releases the GIL during inference, so detection and segmentation can overlap
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="vision")
+
+
+def parse_analyses(value, default=("caption",)):
+    if not value:
+        return tuple(default)
+    requested = [name.strip().lower() for name in value.split(",")]
+    unknown = [name for name in requested if name not in ANALYSES]
+    if unknown:
+        raise ValueError(f"Unknown analysis: {', '.join(unknown)}")
+    return tuple(name for name in ANALYSES if name in requested)
+
+
+def decode_image(data: bytes) -> Image.Image:
+    image = Image.open(io.BytesIO(data))
+    return image.convert("RGB")
+
+
+def prepare_inputs(image: Image.Image, analyses, policy=None):
+    from torchvision.transforms import functional as F
+
+    # Bound the resolution first so a 12 MP upload costs about the same as a 1 MP one
+    image, info = resize_policy.bound_image(image, policy)
+    base = F.to_tensor(image)  # CHW float in [0, 1], shared by every model
+    inputs = {}
+    if "screen" in analyses:
+        screen_input = F.resize(base, [weapon_screen.INPUT_SIZE, weapon_screen.INPUT_SIZE], antialias=True)
+        inputs["screen"] = F.normalize(screen_input, IMAGENET_MEAN, IMAGENET_STD)
+    if "caption" in analyses:
+        inputs["caption"] = caption_batcher.pixel_values(base)
+    if "detect" in analyses:
+        inputs["detect"] = resize_policy.letterbox(base, policy)  # Faster R-CNN normalises internally
+    if "segment" in analyses:
+        inputs["segment"] = resize_policy.letterbox(F.normalize(base, IMAGENET_MEAN, IMAGENET_STD), policy)
+    return inputs, info
+
+
+# --- Segmentation ---
+def segment_image(input_tensor, info, policy=None):
+    import torch
+    segmentation_model = model_registry.get("deeplabv3")
+
+    height, width = input_tensor.shape[-2:]
+    mask = torch.zeros((height, width), dtype=torch.uint8)
+    with inference_governor.slot("deeplabv3"), torch.no_grad():
+        for (x0, y0, x1, y1), (cx0, cy0, cx1, cy1) in resize_policy.tile_windows(width, height, policy):
+            output = segmentation_model(input_tensor[:, y0:y1, x0:x1].unsqueeze(0))
+            tile_mask = output['out'][0].argmax(0)  # Take class with highest probability
+            mask[cy0:cy1, cx0:cx1] = tile_mask[cy0 - y0:cy1 - y0, cx0 - x0:cx1 - x0].byte()
+
+    return resize_policy.mask_to_original(Image.fromarray(mask.cpu().numpy()), info)
+
+
+# --- Object Detection ---
+def detect_objects(input_tensor, info, policy=None, options=None):
+    import torch
+    from torchvision.ops import batched_nms
+    detection_model = model_registry.get("fasterrcnn")
+
+    height, width = input_tensor.shape[-2:]
+    windows = resize_policy.tile_windows(width, height, policy)
+    all_boxes, all_labels, all_scores = [], [], []
+    with inference_governor.slot("fasterrcnn"), torch.no_grad():
+        for (x0, y0, x1, y1), _ in windows:
+            prediction = detection_model(input_tensor[:, y0:y1, x0:x1].unsqueeze(0))[0]
+            all_boxes.append(prediction['boxes'] + torch.tensor([x0, y0, x0, y0], dtype=prediction['boxes'].dtype))
+            all_labels.append(prediction['labels'])
+            all_scores.append(prediction['scores'])
+
+    boxes, labels, scores = detection.filter_detections(
+        torch.cat(all_boxes), torch.cat(all_labels), torch.cat(all_scores), options)
+    if len(windows) > 1:
+        # The same object can be found by two overlapping tiles
+        keep = batched_nms(boxes, scores, labels, detection.NMS_THRESHOLD)
+        boxes, labels, scores = boxes[keep], labels[keep], scores[keep]
+    boxes, labels, scores = detection.limit_detections(boxes, labels, scores, options)
+    boxes = resize_policy.boxes_to_original(boxes, info)
+    return detection.to_json(boxes, labels, scores)
+
+
+def analyze(image: Image.Image, analyses=ANALYSES, options=None, policy=None, progress=None, detect_options=None,
+            on_caption_text=None):
+    # Serve what we can from the result cache and only run models for the rest.
+    # progress(stage, seconds), if given, is called as each stage finishes;
+    # on_caption_text(piece), if given, receives the caption while BLIP generates it.
+    policy = policy or resize_policy.POLICY
+    detect_options = detect_options or detection.DEFAULT_OPTIONS
+    if weapon_screen.ENABLED and "screen" not in analyses:
+        analyses = ("screen",) + tuple(analyses)
+    options = dict(options or {}, resize=policy)
+    pixel_hash = analysis_cache.image_hash(image)
+    keys = {name: analysis_cache.make_key(pixel_hash, name, dict(options, detect=detect_options) if name == "detect" else options)
+            for name in analyses}
+
+    result = {}
+    missing = []
+    for name in analyses:
+        found, value = analysis_cache.cache.get(keys[name])
+        if found:
+            result[RESULT_KEYS[name]] = value
+        else:
+            missing.append(name)
+    if not missing or _short_circuit(result):
+        return result
+
+    start = time.perf_counter()
+    inputs, info = prepare_inputs(image, missing, policy)
+    if progress:
+        progress("prepare", time.perf_counter() - start)
+
+    if "screen" in inputs:
+        # Synchronous and first: a few ms on CPU, and it decides whether the rest runs
+        start = time.perf_counter()
+        screening = weapon_screen.screen_tensor(inputs.pop("screen"))
+        analysis_cache.cache.put(keys["screen"], screening)
+        result["screening"] = screening
+        if progress:
+            progress("screen", time.perf_counter() - start)
+        if _short_circuit(result):
+            return result
+
+    # Each model runs in a copy of this request's context, so the timings it
+    # records (model-*) land in the request's Server-Timing header. The shared
+    # caption batcher thread serves several requests per batch and can't.
+    def submit(fn, *args):
+        return _executor.submit(contextvars.copy_context().run, fn, *args)
+
+    submitted = time.perf_counter()
+    pending = {}
+    if "caption" in inputs and on_caption_text is not None:
+        # Submitted first so it gets a thread before detection/segmentation
+        pending["caption"] = submit(caption_batcher.stream_caption, inputs["caption"], on_caption_text)
+    elif "caption" in inputs:
+        pending["caption"] = caption_batcher.batcher.submit(inputs["caption"])
+    if "detect" in inputs:
+        pending["detect"] = submit(detect_objects, inputs["detect"], info, policy, detect_options)
+    if "segment" in inputs:
+        pending["segment"] = submit(segment_image, inputs["segment"], info, policy)
+    if progress:
+        # Reported as each model finishes, not in collection order
+        for name, future in pending.items():
+            future.add_done_callback(lambda _, name=name: progress(name, time.perf_counter() - submitted))
+
+    for name, future in pending.items():
+        value = future.result()
+        request_metrics.timing(name, time.perf_counter() - submitted)  # Server-Timing, if enabled
+        analysis_cache.cache.put(keys[name], value)
+        result[RESULT_KEYS[name]] = value
+    return result
+
+
+def screened_out(result):
+    # True when the weapon screen flagged the image and the other models were skipped
+    return bool(result.get("screening", {}).get("short_circuit"))
+
+
+def _short_circuit(result):
+    # Flagged images skip the remaining models when OMNIBOT_WEAPON_SHORT_CIRCUIT=1
+    screening = result.get("screening")
+    if not (weapon_screen.SHORT_CIRCUIT and screening and screening["flagged"]):
+        return False
+    result["screening"] = dict(screening, short_circuit=True)
+    return True
+
+
+# --- Response Formatting ---
+def build_response(result, objects_in_caption=False, mask_format="png"):
+    response = {}
+    if "caption" in result:
+        response["caption"] = result["caption"]
+    if "objects" in result:
+        detections = result["objects"]
+        response["detections"] = detections  # label, class_id, score, box in original image pixels
+        response["object_count"] = len(detections)
+        response["objects"] = [f"Object: {d['label']}, Confidence: {d['score']:.2f}" for d in detections]
+        response["boxes"] = [d["box"] for d in detections]
+    if "segmentation" in result:
+        # PNG data URIs keep the key the frontend reads; RLE / polygons are structured JSON
+        encoded = mask_codec.encode(result["segmentation"], mask_format)
+        response["segmented_image" if mask_format in ("png", "palette") else "segmentation"] = encoded
+    if objects_in_caption and "caption" in response and "objects" in response:
+        # Keep the object summary in the caption for clients that only show the caption
+        response["caption"] += f"\nDetected objects: {response['object_count']}. Objects: {', '.join(response['objects'])}"
+
+    # Classifier, detector and caption signals merged; the warning leads the caption as before
+    screening = weapon_screen.combine(result)
+    if screening is not None:
+        response["screening"] = screening
+        if screening["flagged"]:
+            warning = weapon_screen.warning(screening["categories"])
+            response["caption"] = warning + "\n" + response["caption"] if "caption" in response else warning
+    return response
+
+
+# --- Background Job ---
+def run_job(job, data, analyses, objects_in_caption=False, mask_format="png", detect_options=None):
+    # Same work as a synchronous /upload, run on a job_queue worker with per-stage timings
+    with job.stage("decode"):
+        image = decode_image(data)
+    result = analyze(image, analyses, progress=job.record, detect_options=detect_options)
+    with job.stage("encode"):
+        return build_response(result, objects_in_caption, mask_format)
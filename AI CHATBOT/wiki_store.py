@@ -0,0 +1,272 @@
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+
+import request_metrics
+
+# --- Wikipedia Summary Store ---
+# Each topic is fetched from Wikipedia once; the article text and its sentence
+# split are kept in memory (LRU, TTL, bounded by total characters) so "more
+# about him" follow-ups never hit the network again. A local JSONL dump
+# ({"title": ..., "text": ...} per line) can back the store, either as an
+# offline fallback or, with OMNIBOT_WIKI_OFFLINE=1, as the only source.
+# Topics that could not be found are remembered for OMNIBOT_WIKI_MISS_TTL
+# seconds, so a repeated question about them doesn't go to the network again.
+#
+# Both apps resolve a topic the same way: the plain-text extract of the best
+# hit of a MediaWiki search, over urllib (Flask) or a pooled aiohttp session
+# (asgi.py).
+#
+# Build a dump for a list of topics with:
+#   python wiki_store.py build-dump topics.txt wiki_dump.jsonl
+
+TTL = float(os.environ.get("OMNIBOT_WIKI_TTL", str(24 * 3600)))
+MISS_TTL = float(os.environ.get("OMNIBOT_WIKI_MISS_TTL", "300"))
+TIMEOUT = float(os.environ.get("OMNIBOT_WIKI_TIMEOUT", "10"))
+MAX_TOPICS = int(os.environ.get("OMNIBOT_WIKI_MAX_TOPICS", "500"))
+MAX_CHARS = int(os.environ.get("OMNIBOT_WIKI_MAX_CHARS", str(20 * 1024 * 1024)))
+DUMP_PATH = os.environ.get("OMNIBOT_WIKI_DUMP", "")
+OFFLINE = os.environ.get("OMNIBOT_WIKI_OFFLINE", "") == "1"
+API_URL = "https://en.wikipedia.org/w/api.php"
+USER_AGENT = "OmniBot-AI (https://github.com/srirammulukuntla11/OmniBot-AI)"
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def normalize_topic(topic):
+    return " ".join(topic.lower().split())
+
+
+def split_sentences(text):
+    # Section headings ("== History ==") are dropped, everything else is split into sentences
+    lines = [line for line in text.splitlines() if line.strip() and not line.strip().startswith("==")]
+    return [s for s in SENTENCE_RE.split(" ".join(lines)) if s]
+
+
+class DumpIndex:
+    # Title -> byte offset into the JSONL dump; articles are read on demand
+    def __init__(self, path):
+        self.path = path
+        self._offsets = {}
+        with open(path, "rb") as f:
+            offset = 0
+            for line in f:
+                try:
+                    title = json.loads(line)["title"]
+                except (ValueError, KeyError):
+                    title = None
+                if title:
+                    self._offsets.setdefault(normalize_topic(title), offset)
+                offset += len(line)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def get(self, topic):
+        offset = self._offsets.get(normalize_topic(topic))
+        if offset is None:
+            return None
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())["text"]
+
+
+def _search_params(topic):
+    # Best search hit's plain-text extract, following redirects
+    return {"action": "query", "format": "json", "generator": "search", "gsrsearch": topic, "gsrlimit": "1",
+            "prop": "extracts", "explaintext": "1", "redirects": "1"}
+
+
+def _extract(data, topic):
+    for page in data.get("query", {}).get("pages", {}).values():
+        if page.get("extract"):
+            return page["extract"]
+    raise LookupError(f"No article for {topic!r}")
+
+
+def _fetch_online(topic):
+    url = API_URL + "?" + urllib.parse.urlencode(_search_params(topic))
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+        return _extract(json.load(response), topic)
+
+
+async def fetch_online_async(session, topic):
+    # Same query as _fetch_online, over the asyncio app's pooled aiohttp session
+    async with session.get(API_URL, params=_search_params(topic), headers={"User-Agent": USER_AGENT}) as response:
+        response.raise_for_status()
+        return _extract(await response.json(), topic)
+
+
+class WikiStore:
+    def __init__(self, ttl=TTL, max_topics=MAX_TOPICS, max_chars=MAX_CHARS,
+                 dump_path=DUMP_PATH, offline=OFFLINE, fetch=_fetch_online, miss_ttl=MISS_TTL):
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self.max_topics = max_topics
+        self.max_chars = max_chars
+        self.offline = offline
+        self._fetch = fetch
+        self._entries = OrderedDict()
+        self._misses = OrderedDict()  # topic -> expiry of a failed lookup
+        self._chars = 0
+        self._lock = threading.Lock()
+        self._topic_locks = {}
+        self._pending = {}  # topic -> asyncio task, for prefetch()
+        self._stats = {"hits": 0, "miss_hits": 0, "fetches": 0, "dump_hits": 0, "failures": 0, "evictions": 0}
+        self.dump = DumpIndex(dump_path) if dump_path and os.path.exists(dump_path) else None
+
+    def sentences(self, topic):
+        key = normalize_topic(topic)
+        entry = self._cached(key)
+        if entry is not None:
+            return entry["sentences"]
+
+        # One fetch per topic even when several requests ask for it at once
+        with self._lock:
+            topic_lock = self._topic_locks.setdefault(key, threading.Lock())
+        with topic_lock:
+            entry = self._cached(key)
+            if entry is None:
+                entry = self._load(key)
+            with self._lock:
+                self._topic_locks.pop(key, None)
+        return entry["sentences"]
+
+    def _cached(self, key):
+        # The entry, None if the topic has to be fetched, LookupError if it recently failed
+        with self._lock:
+            expires = self._misses.get(key)
+            if expires is not None:
+                if expires >= time.monotonic():
+                    self._stats["miss_hits"] += 1
+                    raise LookupError(f"No article for {key!r}")
+                del self._misses[key]
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry["expires"] < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry
+
+    async def prefetch(self, topic, fetch):
+        # Async version of sentences() for the asyncio app: fetch(topic) is a
+        # coroutine, and concurrent requests for one topic share a single fetch
+        key = normalize_topic(topic)
+        entry = self._cached(key)
+        if entry is not None:
+            return entry["sentences"]
+        task = self._pending.get(key)
+        if task is None:
+            task = self._pending[key] = asyncio.ensure_future(self._load_async(key, fetch))
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return (await asyncio.shield(task))["sentences"]
+
+    async def _load_async(self, key, fetch):
+        text = None
+        if not self.offline:
+            start = time.perf_counter()
+            try:
+                text = await fetch(key)
+                self._count("fetches")
+            except Exception:
+                text = None
+            request_metrics.observe(request_metrics.wikipedia, "ok" if text is not None else "error",
+                                    time.perf_counter() - start, "wikipedia")
+        return self._store(key, text)
+
+    def _load(self, key):
+        text = None
+        if not self.offline:
+            start = time.perf_counter()
+            try:
+                text = self._fetch(key)
+                self._count("fetches")
+            except Exception:
+                text = None
+            request_metrics.observe(request_metrics.wikipedia, "ok" if text is not None else "error",
+                                    time.perf_counter() - start, "wikipedia")
+        return self._store(key, text)
+
+    def _store(self, key, text):
+        # Falls back to the dump when nothing was fetched
+        if text is None and self.dump is not None:
+            text = self.dump.get(key)
+            if text is not None:
+                self._count("dump_hits")
+        if text is None:
+            with self._lock:
+                self._stats["failures"] += 1
+                if self.miss_ttl > 0:
+                    self._misses[key] = time.monotonic() + self.miss_ttl
+                    self._misses.move_to_end(key)
+                    while len(self._misses) > self.max_topics:
+                        self._misses.popitem(last=False)
+            raise LookupError(f"No article for {key!r}")
+
+        entry = {"text": text, "sentences": split_sentences(text), "expires": time.monotonic() + self.ttl}
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self._chars += len(text)
+            while self._entries and (len(self._entries) > self.max_topics or self._chars > self.max_chars):
+                self._drop(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+        return entry
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._chars -= len(entry["text"])
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["topics"] = len(self._entries)
+            stats["missing_topics"] = len(self._misses)
+            stats["chars"] = self._chars
+        stats["dump_topics"] = len(self.dump) if self.dump else 0
+        stats["offline"] = self.offline
+        return stats
+
+
+# Shared store used by get_wikipedia_info
+store = WikiStore()
+
+
+def build_dump(topics_path, out_path):
+    with open(topics_path) as f:
+        topics = [line.strip() for line in f if line.strip()]
+    written = 0
+    with open(out_path, "w") as out:
+        for topic in topics:
+            try:
+                text = _fetch_online(topic)
+            except Exception as e:
+                print(f"skipped {topic}: {e}")
+                continue
+            out.write(json.dumps({"title": topic, "text": text}) + "\n")
+            written += 1
+    return written
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "build-dump":
+        print("usage: python wiki_store.py build-dump topics.txt wiki_dump.jsonl")
+        sys.exit(1)
+    print(f"wrote {build_dump(sys.argv[2], sys.argv[3])} articles")
+    sys.exit(0)
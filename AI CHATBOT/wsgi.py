@@ -0,0 +1,29 @@
+import importlib
+import os
+
+import model_registry
+import weapon_screen
+
+# --- WSGI Entry Point ---
+#   gunicorn wsgi:app        (settings come from gunicorn.conf.py)
+#
+# OMNIBOT_APP picks the app module: hi (default), main, segmentation or virtual2.
+# OMNIBOT_PRELOAD_MODELS lists models to load before the workers are forked
+# ("all" for every registered model, empty for lazy loading per worker). "all"
+# leaves out the screening model unless OMNIBOT_WEAPON_SCREEN=1 screens every upload.
+
+APP_MODULE = os.environ.get("OMNIBOT_APP", "hi")
+PRELOAD_MODELS = os.environ.get("OMNIBOT_PRELOAD_MODELS", "")
+
+
+def create_app(module_name=APP_MODULE, preload=PRELOAD_MODELS):
+    module = importlib.import_module(module_name)
+    names = [name.strip() for name in preload.split(",") if name.strip()]
+    if names == ["all"]:
+        names = [name for name in model_registry.names() if weapon_screen.ENABLED or name != "mobilenet_v3"]
+    if names:
+        model_registry.preload(names)
+    return module.app
+
+
+app = create_app()